@@ -0,0 +1,357 @@
+"""Benchmarks for the pack, unpack and conversion paths of every format.
+
+Inputs are generated from a fixed seed, so results are comparable between runs and machines:
+
+    python benchmarks/bench.py -o before.json
+    python benchmarks/bench.py -o after.json --compare before.json
+
+Each benchmark reports the minimum and median of its timed runs and the peak memory allocated by one extra run.
+"""
+
+import argparse
+import importlib.metadata
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from PIL import Image
+
+import nitrogfx.convert as conv
+from nitrogfx.nanr import NANR, Sequence
+from nitrogfx.ncer import NCER, OAM, Cell
+from nitrogfx.ncgr import NCGR, Tile
+from nitrogfx.nclr import NCLR
+from nitrogfx.nscr import NSCR
+from nitrogfx.util import TilesetBuilder
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str):
+  """Registers a benchmark. The decorated function does any setup and returns the function to time.
+  :param name: name of the benchmark in results
+  """
+
+  def register(setup):
+    BENCHMARKS[name] = setup
+    return setup
+
+  return register
+
+
+def make_tiles(count: int, bpp: int, unique: int, rng: random.Random) -> list[Tile]:
+  "Tiles drawn from a pool of unique tiles, some of them flipped, like in a real background"
+  pool = [Tile(bytes(rng.randrange(1 << bpp) for _ in range(64))) for _ in range(unique)]
+  return [rng.choice(pool).flipped(rng.random() < 0.25, rng.random() < 0.25) for _ in range(count)]
+
+
+def make_ncgr(bpp: int, count: int = 4096) -> NCGR:
+  ncgr = NCGR(bpp)
+  ncgr.tiles = make_tiles(count, bpp, count, random.Random(bpp))
+  ncgr.width = 32
+  ncgr.height = count // 32
+  return ncgr
+
+
+def make_nclr() -> NCLR:
+  rng = random.Random(1)
+  nclr = NCLR()
+  nclr.colors = [(rng.randrange(32) * 8, rng.randrange(32) * 8, rng.randrange(32) * 8) for _ in range(256)]
+  return nclr
+
+
+def make_nscr(size: int = 512, tile_cnt: int = 1024) -> NSCR:
+  rng = random.Random(2)
+  nscr = NSCR(size, size, 1)
+  for i in range(len(nscr.entries)):
+    nscr.entries[i] = rng.randrange(tile_cnt) | (rng.randrange(4) << 10)
+  return nscr
+
+
+def make_image(size: int = 512) -> Image.Image:
+  "Indexed image made of repeated and flipped tiles, so tileset building has duplicates to find"
+  tiles = make_tiles((size // 8) ** 2, 8, 512, random.Random(3))
+  img = Image.new("P", (size, size))
+  img.putpalette([c for color in make_nclr().colors for c in color])
+  pixels = bytearray(size * size)
+  for i, tile in enumerate(tiles):
+    x = i % (size // 8) * 8
+    y = i // (size // 8) * 8
+    for row in range(8):
+      pixels[(y + row) * size + x : (y + row) * size + x + 8] = tile.pixels[row * 8 : row * 8 + 8]
+  img.frombytes(bytes(pixels))
+  return img
+
+
+def make_ncer(cell_cnt: int = 1000, oam_cnt: int = 4) -> NCER:
+  rng = random.Random(4)
+  ncer = NCER()
+  for i in range(cell_cnt):
+    cell = Cell()
+    for j in range(oam_cnt):
+      oam = OAM()
+      oam.x = rng.randrange(-64, 64) & 0x1FF
+      oam.y = rng.randrange(-64, 64) & 0xFF
+      oam.set_size(rng.choice([(8, 8), (16, 16), (32, 32), (32, 16), (16, 32)]))
+      oam.char = rng.randrange(0x400)
+      oam.pal = rng.randrange(16)
+      oam.colors = 16
+      cell.oam.append(oam)
+    ncer.cells.append(cell)
+  ncer.labels = [f"cell_{i}" for i in range(cell_cnt)]
+  return ncer
+
+
+def make_nanr(seq_cnt: int = 8, frame_cnt: int = 500) -> NANR:
+  rng = random.Random(5)
+  nanr = NANR()
+  for i in range(seq_cnt):
+    seq = Sequence()
+    seq.frame_type = i % 3
+    for j in range(frame_cnt):
+      frame = seq.add_frame()
+      frame.index = rng.randrange(64)
+      frame.duration = rng.randrange(1, 8)
+    nanr.anims.append(seq)
+  nanr.labels = [f"anim_{i}" for i in range(seq_cnt)]
+  return nanr
+
+
+for bpp in (4, 8):
+
+  @benchmark(f"ncgr_pack_{bpp}bpp")
+  def _(bpp=bpp):
+    ncgr = make_ncgr(bpp)
+    return ncgr.pack
+
+  @benchmark(f"ncgr_unpack_{bpp}bpp")
+  def _(bpp=bpp):
+    data = make_ncgr(bpp).pack()
+    return lambda: NCGR.unpack(data)
+
+  @benchmark(f"ncgr_unpack_{bpp}bpp_packed")
+  def _(bpp=bpp):
+    data = make_ncgr(bpp).pack()
+    return lambda: NCGR.unpack(data, packed=True)
+
+
+@benchmark("ncbr_unpack_4bpp")
+def _():
+  ncgr = make_ncgr(4)
+  ncgr.ncbr = True
+  data = ncgr.pack()
+  return lambda: NCGR.unpack(data)
+
+
+@benchmark("nclr_pack")
+def _():
+  return make_nclr().pack
+
+
+@benchmark("nclr_unpack")
+def _():
+  data = make_nclr().pack()
+  return lambda: NCLR.unpack(data)
+
+
+@benchmark("nscr_pack_512")
+def _():
+  return make_nscr().pack
+
+
+@benchmark("nscr_unpack_512")
+def _():
+  data = make_nscr().pack()
+  return lambda: NSCR.unpack(data)
+
+
+@benchmark("ncer_pack")
+def _():
+  return make_ncer().pack
+
+
+@benchmark("ncer_unpack")
+def _():
+  data = make_ncer().pack()
+  return lambda: NCER.unpack(data)
+
+
+@benchmark("nanr_pack")
+def _():
+  return make_nanr().pack
+
+
+@benchmark("nanr_unpack")
+def _():
+  data = make_nanr().pack()
+  return lambda: NANR.unpack(data)
+
+
+@benchmark("tileset_get_map_entry")
+def _():
+  tiles = make_tiles(4096, 8, 512, random.Random(6))
+
+  def run():
+    builder = TilesetBuilder()
+    for tile in tiles:
+      builder.get_map_entry(tile)
+
+  return run
+
+
+@benchmark("img_to_nscr_512")
+def _():
+  img = make_image()
+  return lambda: conv.img_to_nscr(img)
+
+
+@benchmark("img_to_nscr_512_no_flipping")
+def _():
+  img = make_image()
+  return lambda: conv.img_to_nscr(img, use_flipping=False)
+
+
+@benchmark("img_to_ncgr_512")
+def _():
+  img = make_image()
+  return lambda: conv.img_to_ncgr(img)
+
+
+@benchmark("img_to_ncgr_512_contiguous")
+def _():
+  img = make_image()
+  return lambda: conv.img_to_ncgr(img, contiguous=True)
+
+
+@benchmark("nscr_to_img_512")
+def _():
+  ncgr, nscr, nclr = make_ncgr(8, 1024), make_nscr(), make_nclr()
+  return lambda: conv.nscr_to_img(ncgr, nscr, nclr)
+
+
+@benchmark("nscr_to_img_512_rgba")
+def _():
+  ncgr, nscr, nclr = make_ncgr(8, 1024), make_nscr(), make_nclr()
+  return lambda: conv.nscr_to_img(ncgr, nscr, nclr, "RGBA")
+
+
+@benchmark("ncer_to_img_sheet")
+def _():
+  ncer, ncgr, nclr = make_ncer(256), make_ncgr(4, 2048), make_nclr()
+  return lambda: conv.ncer_to_img(ncer, ncgr, nclr)
+
+
+@benchmark("ncer_json_roundtrip")
+def _():
+  ncer = make_ncer()
+  path = os.path.join(tempfile.mkdtemp(), "cells.json")
+
+  def run():
+    conv.ncer_to_json(ncer, path)
+    conv.json_to_ncer(path)
+
+  return run
+
+
+@benchmark("nanr_json_roundtrip")
+def _():
+  nanr = make_nanr()
+  path = os.path.join(tempfile.mkdtemp(), "anims.json")
+
+  def run():
+    conv.nanr_to_json(nanr, path)
+    conv.json_to_nanr(path)
+
+  return run
+
+
+def run_benchmark(setup, repeat: int, min_time: float) -> dict:
+  """Times a benchmark and measures its peak memory
+  :param setup: registered benchmark function
+  :param repeat: number of timed runs, more are done until min_time has passed
+  :param min_time: minimum total seconds to spend timing
+  :return: dict of results
+  """
+  fn = setup()
+  fn()  # warm up caches
+  times = []
+  start = time.perf_counter()
+  while len(times) < repeat or time.perf_counter() - start < min_time:
+    t = time.perf_counter()
+    fn()
+    times.append(time.perf_counter() - t)
+  tracemalloc.start()
+  fn()
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return {"min": min(times), "median": statistics.median(times), "runs": len(times), "peak_bytes": peak}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> int:
+  """Prints the change of every benchmark against a baseline
+  :param results: results of this run
+  :param baseline: results of an earlier run
+  :param threshold: slowdown ratio that counts as a regression
+  :return: number of regressions
+  """
+  regressions = 0
+  for name, result in results.items():
+    if name not in baseline:
+      continue
+    ratio = result["min"] / baseline[name]["min"]
+    mem_ratio = result["peak_bytes"] / max(baseline[name]["peak_bytes"], 1)
+    flag = "  REGRESSION" if ratio > threshold else ""
+    print(f"{name:32} {ratio:6.2f}x time {mem_ratio:6.2f}x memory{flag}")
+    regressions += ratio > threshold
+  return regressions
+
+
+def package_version() -> str | None:
+  try:
+    return importlib.metadata.version("nitrogfx-py")
+  except importlib.metadata.PackageNotFoundError:
+    return None
+
+
+def main(argv: list[str] | None = None) -> int:
+  parser = argparse.ArgumentParser(description="Benchmark nitrogfx pack, unpack and conversion paths.")
+  parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name contains this")
+  parser.add_argument("-r", "--repeat", type=int, default=5, help="minimum number of timed runs")
+  parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds to time each benchmark")
+  parser.add_argument("-o", "--output", help="write results as JSON to this file")
+  parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+  parser.add_argument("--threshold", type=float, default=1.1, help="slowdown ratio reported as a regression")
+  args = parser.parse_args(argv)
+
+  results = {}
+  for name, setup in BENCHMARKS.items():
+    if args.filter not in name:
+      continue
+    results[name] = result = run_benchmark(setup, args.repeat, args.min_time)
+    print(f"{name:32} {result['min'] * 1000:10.3f} ms {result['median'] * 1000:10.3f} ms {result['peak_bytes']:>12} B")
+
+  if args.output:
+    meta = {
+      "python": sys.version.split()[0],
+      "implementation": platform.python_implementation(),
+      "machine": platform.machine(),
+      "nitrogfx": package_version(),
+    }
+    with open(args.output, "w") as f:
+      json.dump({"meta": meta, "results": results}, f, indent=2)
+
+  if args.compare:
+    with open(args.compare) as f:
+      baseline = json.load(f)["results"]
+    return 1 if compare(results, baseline, args.threshold) else 0
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
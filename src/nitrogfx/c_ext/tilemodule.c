@@ -1,6 +1,8 @@
 #define PY_SSIZE_T_CLEAN
 #include <Python.h>
 #include <stdio.h>
+#include <stdint.h>
+#include <string.h>
 
 /*C implementations for tile-related hotspots*/
 
@@ -10,57 +12,122 @@
 			return NULL; \
 		}
 
+// Bulk loops over buffers run without the GIL, so tilesets can be converted from several threads at once.
+// Inputs smaller than NOGIL_THRESHOLD bytes keep the GIL, releasing it would cost more than the loop itself.
+#define NOGIL_THRESHOLD 4096
+#define BEGIN_NOGIL(size) { PyThreadState* _save = (size) >= NOGIL_THRESHOLD ? PyEval_SaveThread() : NULL;
+#define END_NOGIL() if(_save) PyEval_RestoreThread(_save); }
+
+// Gets the pixels of a tile list item, which can be any bytes-like object of 64 bytes.
+// Returns -1 with an exception set if it isn't, the buffer must be released otherwise.
+static int get_tile(PyObject* item, Py_buffer* tile){
+	if(PyObject_GetBuffer(item, tile, PyBUF_SIMPLE) < 0){
+		PyErr_Format(PyExc_TypeError, "Tiles should be bytes-like objects, not %.200s", Py_TYPE(item)->tp_name);
+		return -1;
+	}
+	if(tile->len != 64){
+		PyBuffer_Release(tile);
+		PyErr_SetString(PyExc_ValueError, "Tiles should be 64 bytes long");
+		return -1;
+	}
+	return 0;
+}
 
-// _4bpp_to_8bpp(input : bytes) -> bytes
-static PyObject* _4bpp_to_8bpp(PyObject *self, PyObject *args){
-	const unsigned char* input;
-	Py_ssize_t input_len;
+// Tile lists passed in by the caller are copied to a tuple before use. Without the GIL another thread could
+// resize the list or free an item while it's borrowed, the snapshot holds its own reference to every item.
 
-	if(!PyArg_ParseTuple(args, "y#", &input, &input_len))
-		return NULL;
 
-	char* output = PyMem_Malloc(2*input_len);
-	int j = 0;
-	for(int i = 0;i<input_len;i++){
-		output[j++] = input[i] & 0xF;
-		output[j++] = input[i] >> 4;
+// Copies one 8-pixel tile row between two depths. Rows are 8 bytes at 8bpp and 4 bytes at 4bpp.
+static void convert_row(unsigned char* dst, unsigned int dst_bpp, const unsigned char* src, unsigned int src_bpp){
+	if(src_bpp == dst_bpp){
+		memcpy(dst, src, src_bpp == 8 ? 8 : 4);
+	}else if(src_bpp == 4){
+		for(int i = 0;i<4;i++){
+			dst[2*i] = src[i] & 0xF;
+			dst[2*i+1] = src[i] >> 4;
+		}
+	}else{
+		for(int i = 0;i<4;i++)
+			dst[i] = (src[2*i] & 0xF) | (src[2*i+1] << 4);
 	}
+}
 
-	return PyBytes_FromStringAndSize(output, 2*input_len);
+// Reads tile (tx, ty) of an NCBR bitmap `width` tiles wide into `tile`.
+static void read_ncbr(unsigned char* tile, unsigned int tile_bpp, const unsigned char* bitmap, unsigned int bpp,
+		unsigned int width, unsigned int tx, unsigned int ty){
+	Py_ssize_t stride = (bpp == 8 ? 8 : 4) * (Py_ssize_t)width;
+	const unsigned char* line = bitmap + 8*ty*stride + tx*(bpp == 8 ? 8 : 4);
+	for(int row = 0;row<8;row++){
+		convert_row(tile, tile_bpp, line, bpp);
+		tile += tile_bpp == 8 ? 8 : 4;
+		line += stride;
+	}
 }
 
+// Writes `tile` to tile (tx, ty) of an NCBR bitmap `width` tiles wide.
+static void write_ncbr(unsigned char* bitmap, unsigned int bpp, const unsigned char* tile, unsigned int tile_bpp,
+		unsigned int width, unsigned int tx, unsigned int ty){
+	Py_ssize_t stride = (bpp == 8 ? 8 : 4) * (Py_ssize_t)width;
+	unsigned char* line = bitmap + 8*ty*stride + tx*(bpp == 8 ? 8 : 4);
+	for(int row = 0;row<8;row++){
+		convert_row(line, bpp, tile, tile_bpp);
+		tile += tile_bpp == 8 ? 8 : 4;
+		line += stride;
+	}
+}
 
-// _8bpp_to_4bpp(input : bytes) -> bytes
-static PyObject* _8bpp_to_4bpp(PyObject *self, PyObject *args){
-	const unsigned char* input;
-	Py_ssize_t input_len;
 
-	if(!PyArg_ParseTuple(args, "y#", &input, &input_len))
-		return NULL;
+// _4bpp_to_8bpp(input : bytes-like) -> bytes
+static PyObject* _4bpp_to_8bpp(PyObject *self, PyObject *args){
+	Py_buffer buffer;
 
-	char* output = PyMem_Malloc(input_len / 2);
-	int j = 0;
-	for(int i = 0;i<input_len/2;i++){
-		output[i] = (input[j] & 0xF) | (input[j+1] << 4);
-		j += 2;
+	if(!PyArg_ParseTuple(args, "y*", &buffer))
+		return NULL;
+	const unsigned char* input = buffer.buf;
+	Py_ssize_t input_len = buffer.len;
+
+	PyObject* result = PyBytes_FromStringAndSize(NULL, 2*input_len);
+	if(result){
+		char* output = PyBytes_AS_STRING(result);
+		Py_ssize_t j = 0;
+		BEGIN_NOGIL(input_len)
+		for(Py_ssize_t i = 0;i<input_len;i++){
+			output[j++] = input[i] & 0xF;
+			output[j++] = input[i] >> 4;
+		}
+		END_NOGIL()
 	}
-
-	return PyBytes_FromStringAndSize(output, input_len / 2);
+	PyBuffer_Release(&buffer);
+	return result;
 }
 
 
-// flip_tile_data(input : bytes, hflip : bool, vflip : bool) -> bytes
-static PyObject* flip_tile_data(PyObject *self, PyObject *args){
-	const unsigned char* input;
-	Py_ssize_t input_len;
-	int hflip, vflip;
+// _8bpp_to_4bpp(input : bytes-like) -> bytes
+static PyObject* _8bpp_to_4bpp(PyObject *self, PyObject *args){
+	Py_buffer buffer;
 
-	if(!PyArg_ParseTuple(args, "y#pp", &input, &input_len, &hflip, &vflip))
+	if(!PyArg_ParseTuple(args, "y*", &buffer))
 		return NULL;
+	const unsigned char* input = buffer.buf;
+	Py_ssize_t input_len = buffer.len;
+
+	PyObject* result = PyBytes_FromStringAndSize(NULL, input_len / 2);
+	if(result){
+		char* output = PyBytes_AS_STRING(result);
+		Py_ssize_t j = 0;
+		BEGIN_NOGIL(input_len)
+		for(Py_ssize_t i = 0;i<input_len/2;i++){
+			output[i] = (input[j] & 0xF) | (input[j+1] << 4);
+			j += 2;
+		}
+		END_NOGIL()
+	}
+	PyBuffer_Release(&buffer);
+	return result;
+}
 
-	ASSERT(input_len == 64, "Tiles must be 64 bytes long.");
 
-	char* output = PyMem_Malloc(64);
+static void flip_tile(unsigned char* output, const unsigned char* input, int hflip, int vflip){
 	for(int y = 0; y<8;y++){
 		for(int x = 0; x<8;x++){
 			int x2 = hflip ? 7-x : x;
@@ -68,7 +135,99 @@ static PyObject* flip_tile_data(PyObject *self, PyObject *args){
 			output[8*y2+x2] = input[8*y+x];
 		}
 	}
-	return PyBytes_FromStringAndSize(output, 64);
+}
+
+
+// flip_tile_data(input : bytes-like, hflip : bool, vflip : bool) -> bytes
+static PyObject* flip_tile_data(PyObject *self, PyObject *args){
+	Py_buffer buffer;
+	int hflip, vflip;
+
+	if(!PyArg_ParseTuple(args, "y*pp", &buffer, &hflip, &vflip))
+		return NULL;
+
+	if(buffer.len != 64){
+		PyBuffer_Release(&buffer);
+		PyErr_SetString(PyExc_ValueError, "Tiles must be 64 bytes long.");
+		return NULL;
+	}
+
+	PyObject* result = PyBytes_FromStringAndSize(NULL, 64);
+	if(result){
+		flip_tile((unsigned char*)PyBytes_AS_STRING(result), buffer.buf, hflip, vflip);
+	}
+	PyBuffer_Release(&buffer);
+	return result;
+}
+
+
+// Writes the smallest of a tile's four flipped variants to `key`, which is equal for all flipped copies of the tile.
+// Returns how the key must be flipped to produce the tile (bit 0 = horizontal, bit 1 = vertical).
+static int flip_key(unsigned char* key, const unsigned char* tile){
+	unsigned char variants[4][64];
+	memcpy(variants[0], tile, 64);
+	flip_tile(variants[1], tile, 1, 0);
+	flip_tile(variants[2], tile, 0, 1);
+	flip_tile(variants[3], tile, 1, 1);
+
+	int best = 0;
+	for(int i = 1;i<4;i++){
+		if(memcmp(variants[i], variants[best], 64) < 0)
+			best = i;
+	}
+	memcpy(key, variants[best], 64);
+	// flips are their own inverse, so flipping the key the same way gives back the tile
+	return best;
+}
+
+// tile_flip_key(input : bytes-like) -> (key : bytes, flip : int)
+// Returns the flip-invariant key of a tile and how the key must be flipped to produce the tile.
+static PyObject* tile_flip_key(PyObject *self, PyObject *args){
+	Py_buffer buffer;
+
+	if(!PyArg_ParseTuple(args, "y*", &buffer))
+		return NULL;
+
+	if(buffer.len != 64){
+		PyBuffer_Release(&buffer);
+		PyErr_SetString(PyExc_ValueError, "Tiles must be 64 bytes long.");
+		return NULL;
+	}
+
+	unsigned char key[64];
+	int flip = flip_key(key, buffer.buf);
+	PyBuffer_Release(&buffer);
+	return Py_BuildValue("(y#i)", (const char*)key, (Py_ssize_t)64, flip);
+}
+
+// tile_flip_keys(data : bytes-like) -> list of (key : bytes, flip : int)
+// tile_flip_key of every tile in 8bpp tile data, 64 bytes per tile.
+static PyObject* tile_flip_keys(PyObject *self, PyObject *args){
+	Py_buffer data;
+
+	if(!PyArg_ParseTuple(args, "y*", &data))
+		return NULL;
+
+	if(data.len % 64 != 0){
+		PyBuffer_Release(&data);
+		PyErr_SetString(PyExc_ValueError, "Tile data length must be a multiple of 64 bytes.");
+		return NULL;
+	}
+
+	Py_ssize_t count = data.len / 64;
+	PyObject* result = PyList_New(count);
+	for(Py_ssize_t i = 0;result && i<count;i++){
+		unsigned char key[64];
+		int flip = flip_key(key, (const unsigned char*)data.buf + 64*i);
+		PyObject* item = Py_BuildValue("(y#i)", (const char*)key, (Py_ssize_t)64, flip);
+		if(!item){
+			Py_CLEAR(result);
+			break;
+		}
+		PyList_SET_ITEM(result, i, item);
+	}
+	PyBuffer_Release(&data);
+	return result;
 }
 
 
@@ -81,34 +240,151 @@ static PyObject* read_ncbr_tile(PyObject *self, PyObject *args){
 	if(!PyArg_ParseTuple(args, "y#III", &data, &data_len, &tilenum, &bpp, &width))
 		return NULL;
 
-	int x = tilenum % width;
-	int y = tilenum / width;
-	int k = 0;
-	char* output = PyMem_Malloc(64);
-	int offset = x*4 + 4*y*width*8;
-	if(bpp == 8){
-		ASSERT(data_len >= 2*offset + 7*width + 8, "8bpp data is too short.");
-		for(int i = 0;i<8;i++){
-			for(int j = 0;j<8;j++){
-				output[k++] = data[2*offset + i*width + j];
+	ASSERT(width > 0, "Width must be positive.");
+	unsigned int x = tilenum % width;
+	unsigned int y = tilenum / width;
+	Py_ssize_t row_size = bpp == 8 ? 8 : 4;
+	Py_ssize_t stride = row_size * width;
+	ASSERT(data_len >= (8*(Py_ssize_t)y+7)*stride + (x+1)*row_size,
+		bpp == 8 ? "8bpp data is too short." : "4bpp data is too short.");
+
+	PyObject* result = PyBytes_FromStringAndSize(NULL, 64);
+	if(!result)
+		return NULL;
+	read_ncbr((unsigned char*)PyBytes_AS_STRING(result), 8, data, bpp, width, x, y);
+	return result;
+}
+
+
+
+// unpack_tiles(data : bytes-like, bpp : int, count : int) -> list of bytes
+// Decodes `count` linearly stored tiles into 64-byte 8bpp tiles in a single pass.
+static PyObject* unpack_tiles(PyObject *self, PyObject *args){
+	Py_buffer data;
+	unsigned int bpp, count;
+
+	if(!PyArg_ParseTuple(args, "y*II", &data, &bpp, &count))
+		return NULL;
+
+	Py_ssize_t tile_size = bpp == 8 ? 64 : 32;
+	if(data.len < tile_size * (Py_ssize_t)count){
+		PyBuffer_Release(&data);
+		PyErr_SetString(PyExc_ValueError, "Tile data is too short.");
+		return NULL;
+	}
+
+	PyObject* result = PyList_New(count);
+	if(!result){
+		PyBuffer_Release(&data);
+		return NULL;
+	}
+	const unsigned char* input = data.buf;
+	for(unsigned int i = 0;i<count;i++){
+		PyObject* tile = PyBytes_FromStringAndSize(NULL, 64);
+		if(!tile){
+			Py_DECREF(result);
+			PyBuffer_Release(&data);
+			return NULL;
+		}
+		unsigned char* output = (unsigned char*)PyBytes_AS_STRING(tile);
+		if(bpp == 8){
+			memcpy(output, input, 64);
+		}else{
+			for(int j = 0;j<32;j++){
+				output[2*j] = input[j] & 0xF;
+				output[2*j+1] = input[j] >> 4;
 			}
 		}
+		input += tile_size;
+		PyList_SET_ITEM(result, i, tile);
+	}
+	PyBuffer_Release(&data);
+	return result;
+}
+
+
+// pack_tiles(header : bytes-like, tiles : list of bytes-like or contiguous tile data, bpp : int, trailer : bytes-like, tiles_bpp : int = 8) -> bytes
+// Writes header, every tile converted to `bpp` and trailer into a single preallocated bytes object.
+// A contiguous `tiles` buffer holds tiles stored at `tiles_bpp`, list items are always 64-byte 8bpp tiles.
+static PyObject* pack_tiles(PyObject *self, PyObject *args){
+	Py_buffer header, trailer, contiguous = {0};
+	PyObject *tiles, *snapshot = NULL, *result = NULL;
+	unsigned int bpp, tiles_bpp = 8;
+
+	if(!PyArg_ParseTuple(args, "y*OIy*|I", &header, &tiles, &bpp, &trailer, &tiles_bpp))
+		return NULL;
+
+	int is_list = PyList_Check(tiles);
+	Py_ssize_t count;
+	if(is_list){
+		snapshot = PyList_AsTuple(tiles);
+		if(!snapshot)
+			goto done;
+		count = PyTuple_GET_SIZE(snapshot);
+	}else{
+		if(PyObject_GetBuffer(tiles, &contiguous, PyBUF_SIMPLE) < 0)
+			goto done;
+		count = contiguous.len / (tiles_bpp == 8 ? 64 : 32);
+	}
+
+	Py_ssize_t tile_size = bpp == 8 ? 64 : 32;
+	result = PyBytes_FromStringAndSize(NULL, header.len + count*tile_size + trailer.len);
+	if(!result)
+		goto done;
+	unsigned char* output = (unsigned char*)PyBytes_AS_STRING(result);
+	memcpy(output, header.buf, header.len);
+	output += header.len;
+
+	if(!is_list && bpp == tiles_bpp){
+		BEGIN_NOGIL(count*tile_size)
+		memcpy(output, contiguous.buf, count*tile_size);
+		END_NOGIL()
+		output += count*tile_size;
+	}else if(!is_list && tiles_bpp == 4){
+		const unsigned char* packed = contiguous.buf;
+		BEGIN_NOGIL(count*32)
+		for(Py_ssize_t i = 0;i<count*32;i++){
+			*output++ = packed[i] & 0xF;
+			*output++ = packed[i] >> 4;
+		}
+		END_NOGIL()
+	}else if(!is_list){
+		const unsigned char* tile = contiguous.buf;
+		BEGIN_NOGIL(count*64)
+		for(Py_ssize_t i = 0;i<count*32;i++)
+			output[i] = (tile[2*i] & 0xF) | (tile[2*i+1] << 4);
+		END_NOGIL()
+		output += count*32;
 	}else{
-		ASSERT(data_len >= offset + 4*7*width + 4, "4bpp data is too short.");
-		for(int i = 0;i<8;i++){
-			for(int j = 0;j<4;j++){
-				unsigned char val = data[offset+j];
-				output[k++] = val & 0xf;
-				output[k++] = val >> 4;
+		for(Py_ssize_t i = 0;i<count;i++){
+			Py_buffer item;
+			if(get_tile(PyTuple_GET_ITEM(snapshot, i), &item) < 0){
+				Py_CLEAR(result);
+				goto done;
+			}
+			const unsigned char* tile = item.buf;
+			if(bpp == 8){
+				memcpy(output, tile, 64);
+			}else{
+				for(int j = 0;j<32;j++)
+					output[j] = (tile[2*j] & 0xF) | (tile[2*j+1] << 4);
 			}
-			offset += 4*width;
+			PyBuffer_Release(&item);
+			output += tile_size;
 		}
 	}
-	return PyBytes_FromStringAndSize(output, 64);
+	memcpy(output, trailer.buf, trailer.len);
+
+done:
+	if(!is_list && contiguous.obj)
+		PyBuffer_Release(&contiguous);
+	Py_XDECREF(snapshot);
+	PyBuffer_Release(&header);
+	PyBuffer_Release(&trailer);
+	return result;
 }
 
 
-
 static void plot_tile(char* dst, int x, int y, char* tile, int width){
 	int k = 0;
 	for(int i = 0;i < 8; i++){
@@ -118,7 +394,7 @@ static void plot_tile(char* dst, int x, int y, char* tile, int width){
 	}
 }
 
-// pack_ncbr_tiles(tiles : list of bytes, width : int, height : int)
+// pack_ncbr_tiles(tiles : list of bytes-like or contiguous 8bpp tile data, width : int, height : int)
 static PyObject* pack_ncbr_tiles(PyObject *self, PyObject *args){
 	PyObject* tiles;
 	unsigned int width, height;
@@ -126,21 +402,50 @@ static PyObject* pack_ncbr_tiles(PyObject *self, PyObject *args){
 	if(!PyArg_ParseTuple(args, "OII", &tiles, &width, &height))
 		return NULL;
 
-	char* output = PyMem_Malloc(width * height * 64);
+	Py_buffer contiguous = {0};
+	PyObject* snapshot = NULL;
+	int is_list = PyList_Check(tiles);
+	if(is_list){
+		snapshot = PyList_AsTuple(tiles);
+		if(!snapshot)
+			return NULL;
+		if(PyTuple_GET_SIZE(snapshot) < (Py_ssize_t)width * height){
+			Py_DECREF(snapshot);
+			PyErr_SetString(PyExc_IndexError, "list index out of range");
+			return NULL;
+		}
+	}else{
+		if(PyObject_GetBuffer(tiles, &contiguous, PyBUF_SIMPLE) < 0)
+			return NULL;
+		if(contiguous.len < (Py_ssize_t)width * height * 64){
+			PyBuffer_Release(&contiguous);
+			PyErr_SetString(PyExc_ValueError, "Tile data is too short.");
+			return NULL;
+		}
+	}
+
+	PyObject* result = PyBytes_FromStringAndSize(NULL, (Py_ssize_t)width * height * 64);
+	if(!result)
+		goto done;
+	char* output = PyBytes_AS_STRING(result);
+	if(!is_list){
+		BEGIN_NOGIL(contiguous.len)
+		for(unsigned int i = 0;i<width*height;i++)
+			plot_tile(output, 8*(i % width), 8*(i / width), (char*)contiguous.buf + 64*i, width*8);
+		END_NOGIL()
+		goto done;
+	}
 	unsigned int x = 0;
 	unsigned int y = 0;
 	for(unsigned int i = 0;i<width*height;i++){
-		PyObject* tile = PyList_GetItem(tiles, i);
-		if(!tile) return NULL;
-
-		char* tiledata;
-		Py_ssize_t tilelen;
-
-		ASSERT(PyBytes_Check(tile), "List contained something other than bytes");
-		PyBytes_AsStringAndSize(tile, &tiledata, &tilelen);
-		ASSERT(tilelen == 64, "Tiles should be 64 bytes long");
+		Py_buffer tile;
+		if(get_tile(PyTuple_GET_ITEM(snapshot, i), &tile) < 0){
+			Py_CLEAR(result);
+			goto done;
+		}
 
-		plot_tile(output, x, y, tiledata, width*8);
+		plot_tile(output, x, y, tile.buf, width*8);
+		PyBuffer_Release(&tile);
 		x += 8;
 		if(x >= width*8){
 			x = 0;
@@ -148,23 +453,400 @@ static PyObject* pack_ncbr_tiles(PyObject *self, PyObject *args){
 		}
 	}
 
-	return PyBytes_FromStringAndSize(output, width*height*64);
+done:
+	if(!is_list)
+		PyBuffer_Release(&contiguous);
+	Py_XDECREF(snapshot);
+	return result;
 }
 
 
-// draw_tile_to_buffer(bytearray, tile : bytes, x : int, y : int, buffer_width : int)
+// unpack_ncbr(data : bytes-like, bpp : int, width : int, height : int, out_bpp : int = 8) -> bytes
+// Converts a whole NCBR bitmap of width*height tiles to tile order. Tiles are returned at out_bpp depth.
+static PyObject* unpack_ncbr(PyObject *self, PyObject *args){
+	Py_buffer data;
+	unsigned int bpp, width, height, out_bpp = 8;
+
+	if(!PyArg_ParseTuple(args, "y*III|I", &data, &bpp, &width, &height, &out_bpp))
+		return NULL;
+
+	Py_ssize_t count = (Py_ssize_t)width * height;
+	if(data.len < count * (bpp == 8 ? 64 : 32)){
+		PyBuffer_Release(&data);
+		PyErr_SetString(PyExc_ValueError, "NCBR data is too short.");
+		return NULL;
+	}
+	Py_ssize_t tile_size = out_bpp == 8 ? 64 : 32;
+	PyObject* result = PyBytes_FromStringAndSize(NULL, count * tile_size);
+	if(result){
+		unsigned char* output = (unsigned char*)PyBytes_AS_STRING(result);
+		BEGIN_NOGIL(count * tile_size)
+		for(unsigned int ty = 0;ty<height;ty++){
+			for(unsigned int tx = 0;tx<width;tx++){
+				read_ncbr(output, out_bpp, data.buf, bpp, width, tx, ty);
+				output += tile_size;
+			}
+		}
+		END_NOGIL()
+	}
+	PyBuffer_Release(&data);
+	return result;
+}
+
+
+// pack_ncbr(tiles : list of bytes-like or contiguous tile data, bpp : int, width : int, height : int, tiles_bpp : int = 8) -> bytes
+// Converts width*height tiles into an NCBR bitmap of depth bpp.
+// A contiguous `tiles` buffer holds tiles stored at `tiles_bpp`, list items are always 64-byte 8bpp tiles.
+static PyObject* pack_ncbr(PyObject *self, PyObject *args){
+	PyObject* tiles;
+	unsigned int bpp, width, height, tiles_bpp = 8;
+
+	if(!PyArg_ParseTuple(args, "OIII|I", &tiles, &bpp, &width, &height, &tiles_bpp))
+		return NULL;
+
+	Py_ssize_t count = (Py_ssize_t)width * height;
+	Py_buffer contiguous = {0};
+	PyObject* snapshot = NULL;
+	int is_list = PyList_Check(tiles);
+	if(is_list){
+		tiles_bpp = 8;
+		snapshot = PyList_AsTuple(tiles);
+		if(!snapshot)
+			return NULL;
+		if(PyTuple_GET_SIZE(snapshot) < count){
+			Py_DECREF(snapshot);
+			PyErr_SetString(PyExc_ValueError, "Not enough tiles for NCBR dimensions.");
+			return NULL;
+		}
+	}else{
+		if(PyObject_GetBuffer(tiles, &contiguous, PyBUF_SIMPLE) < 0)
+			return NULL;
+		if(contiguous.len < count * (tiles_bpp == 8 ? 64 : 32)){
+			PyBuffer_Release(&contiguous);
+			PyErr_SetString(PyExc_ValueError, "Not enough tiles for NCBR dimensions.");
+			return NULL;
+		}
+	}
+
+	PyObject* result = PyBytes_FromStringAndSize(NULL, count * (bpp == 8 ? 64 : 32));
+	if(!result)
+		goto done;
+	unsigned char* output = (unsigned char*)PyBytes_AS_STRING(result);
+	if(!is_list){
+		const unsigned char* tile = contiguous.buf;
+		BEGIN_NOGIL(contiguous.len)
+		for(Py_ssize_t i = 0;i<count;i++){
+			write_ncbr(output, bpp, tile, tiles_bpp, width, i % width, i / width);
+			tile += tiles_bpp == 8 ? 64 : 32;
+		}
+		END_NOGIL()
+		goto done;
+	}
+	for(Py_ssize_t i = 0;i<count;i++){
+		Py_buffer item;
+		if(get_tile(PyTuple_GET_ITEM(snapshot, i), &item) < 0){
+			Py_CLEAR(result);
+			goto done;
+		}
+		write_ncbr(output, bpp, item.buf, tiles_bpp, width, i % width, i / width);
+		PyBuffer_Release(&item);
+	}
+
+done:
+	if(!is_list)
+		PyBuffer_Release(&contiguous);
+	Py_XDECREF(snapshot);
+	return result;
+}
+
+
+// draw_tile_to_buffer(buffer : writable bytes-like, tile : bytes-like, x : int, y : int, buffer_width : int)
 static PyObject* draw_tile_to_buffer(PyObject *self, PyObject *args){
-	PyObject* bytearray;
-	char *buffer, *tile;
+	Py_buffer buffer, tile;
 	unsigned int width, x, y;
-	Py_ssize_t tile_size;
 
-	if(!PyArg_ParseTuple(args, "Yy#III", &bytearray, &tile, &tile_size, &x, &y, &width))
+	if(!PyArg_ParseTuple(args, "w*y*III", &buffer, &tile, &x, &y, &width))
+		return NULL;
+	const char* error = NULL;
+	if(tile.len != 64)
+		error = "Tile is not 64 bytes";
+	else if((Py_ssize_t)(y+7)*width + (x+8) > buffer.len)
+		error = "Buffer is too small";
+	else
+		plot_tile(buffer.buf, x, y, tile.buf, width);
+	PyBuffer_Release(&buffer);
+	PyBuffer_Release(&tile);
+	if(error){
+		PyErr_SetString(PyExc_ValueError, error);
+		return NULL;
+	}
+	Py_RETURN_NONE;
+}
+
+
+// Reads pixel i of a tile stored at 4bpp or 8bpp.
+static inline unsigned char tile_pixel(const unsigned char* tile, unsigned int tile_bpp, int i){
+	if(tile_bpp == 8)
+		return tile[i];
+	return (tile[i >> 1] >> ((i & 1) * 4)) & 0xF;
+}
+
+// Draws a tile to an 8bpp canvas, flipping it while copying.
+static void blit_tile(unsigned char* dst, Py_ssize_t stride, const unsigned char* tile, unsigned int tile_bpp,
+		int xflip, int yflip){
+	for(int y = 0;y<8;y++){
+		int sy = yflip ? 7-y : y;
+		for(int x = 0;x<8;x++){
+			int sx = xflip ? 7-x : x;
+			dst[x] = tile_pixel(tile, tile_bpp, 8*sy + sx);
+		}
+		dst += stride;
+	}
+}
+
+
+// draw_tilemap(canvas : writable bytes-like, canvas_width : int, tiles : bytes-like, tiles_bpp : int,
+//              entries : bytes-like of native uint16 map entries, map_width : int, map_height : int)
+// Draws a whole tilemap (dimensions in tiles) on an 8bpp canvas in one call, applying each entry's flipping.
+static PyObject* draw_tilemap(PyObject *self, PyObject *args){
+	Py_buffer canvas, tiles, entries;
+	unsigned int canvas_width, tiles_bpp, map_width, map_height;
+
+	if(!PyArg_ParseTuple(args, "w*Iy*Iy*II", &canvas, &canvas_width, &tiles, &tiles_bpp, &entries, &map_width, &map_height))
+		return NULL;
+
+	PyObject* error_type = PyExc_ValueError;
+	const char* error = NULL;
+	Py_ssize_t cells = (Py_ssize_t)map_width * map_height;
+	if(canvas_width < 8*map_width || canvas.len < (Py_ssize_t)canvas_width * 8 * map_height)
+		error = "Canvas is too small";
+	else if(entries.len < 2*cells)
+		error = "Not enough map entries";
+
+	if(!error){
+		Py_ssize_t tile_size = tiles_bpp == 8 ? 64 : 32;
+		Py_ssize_t tile_count = tiles.len / tile_size;
+		const uint16_t* map = entries.buf;
+		BEGIN_NOGIL(cells * 64)
+		for(Py_ssize_t i = 0;i<cells;i++){
+			unsigned int raw = map[i];
+			if((Py_ssize_t)(raw & 0x3FF) >= tile_count){
+				error_type = PyExc_IndexError;
+				error = "Tile index out of range";
+				break;
+			}
+			unsigned char* dst = (unsigned char*)canvas.buf + 8*(i / map_width)*(Py_ssize_t)canvas_width + 8*(i % map_width);
+			blit_tile(dst, canvas_width, (const unsigned char*)tiles.buf + (raw & 0x3FF)*tile_size, tiles_bpp,
+					(raw >> 10) & 1, (raw >> 11) & 1);
+		}
+		END_NOGIL()
+	}
+	PyBuffer_Release(&canvas);
+	PyBuffer_Release(&tiles);
+	PyBuffer_Release(&entries);
+	if(error){
+		PyErr_SetString(error_type, error);
 		return NULL;
-	ASSERT(tile_size == 64, "Tile is not 64 bytes");
-	ASSERT((y+7)*width + (x+8) <= PyByteArray_Size(bytearray), "Buffer is too small");
-	buffer = PyByteArray_AS_STRING(bytearray);
-	plot_tile(buffer, x, y, tile, width);
+	}
+	Py_RETURN_NONE;
+}
+
+
+// Draws a tile to an RGB or RGBA canvas, flipping it while copying.
+// Pixels are looked up in an RGBA palette at bank_base + pixel; color 0 of a bank is transparent in RGBA output.
+static void blit_tile_rgb(unsigned char* dst, Py_ssize_t stride, const unsigned char* tile, unsigned int tile_bpp,
+		int xflip, int yflip, const unsigned char* palette, Py_ssize_t palette_count, unsigned int bank_base,
+		unsigned int channels){
+	static const unsigned char missing[4] = {0, 0, 0, 0xFF};
+	for(int y = 0;y<8;y++){
+		int sy = yflip ? 7-y : y;
+		unsigned char* out = dst;
+		for(int x = 0;x<8;x++){
+			int sx = xflip ? 7-x : x;
+			unsigned int pixel = tile_pixel(tile, tile_bpp, 8*sy + sx);
+			unsigned int index = bank_base + pixel;
+			const unsigned char* color = (Py_ssize_t)index < palette_count ? palette + 4*index : missing;
+			out[0] = color[0];
+			out[1] = color[1];
+			out[2] = color[2];
+			if(channels == 4)
+				out[3] = pixel ? color[3] : 0;
+			out += channels;
+		}
+		dst += stride;
+	}
+}
+
+
+// draw_tilemap_rgb(canvas : writable bytes-like, canvas_width : int, tiles : bytes-like, tiles_bpp : int,
+//                  entries : bytes-like of native uint16 map entries, map_width : int, map_height : int,
+//                  palette : bytes-like of RGBA colors, channels : int, use_banks : bool)
+// Like draw_tilemap, but writes RGB (channels=3) or RGBA (channels=4) pixels. With use_banks every entry's
+// 16-color palette bank is applied, as done for 4bpp tilemaps.
+static PyObject* draw_tilemap_rgb(PyObject *self, PyObject *args){
+	Py_buffer canvas, tiles, entries, palette;
+	unsigned int canvas_width, tiles_bpp, map_width, map_height, channels;
+	int use_banks;
+
+	if(!PyArg_ParseTuple(args, "w*Iy*Iy*IIy*Ip", &canvas, &canvas_width, &tiles, &tiles_bpp, &entries,
+			&map_width, &map_height, &palette, &channels, &use_banks))
+		return NULL;
+
+	PyObject* error_type = PyExc_ValueError;
+	const char* error = NULL;
+	Py_ssize_t cells = (Py_ssize_t)map_width * map_height;
+	Py_ssize_t stride = (Py_ssize_t)canvas_width * channels;
+	if(channels != 3 && channels != 4)
+		error = "Canvas must have 3 or 4 channels";
+	else if(canvas_width < 8*map_width || canvas.len < stride * 8 * map_height)
+		error = "Canvas is too small";
+	else if(entries.len < 2*cells)
+		error = "Not enough map entries";
+
+	if(!error){
+		Py_ssize_t tile_size = tiles_bpp == 8 ? 64 : 32;
+		Py_ssize_t tile_count = tiles.len / tile_size;
+		const uint16_t* map = entries.buf;
+		BEGIN_NOGIL(cells * 64)
+		for(Py_ssize_t i = 0;i<cells;i++){
+			unsigned int raw = map[i];
+			if((Py_ssize_t)(raw & 0x3FF) >= tile_count){
+				error_type = PyExc_IndexError;
+				error = "Tile index out of range";
+				break;
+			}
+			unsigned char* dst = (unsigned char*)canvas.buf + 8*(i / map_width)*stride + 8*(i % map_width)*channels;
+			blit_tile_rgb(dst, stride, (const unsigned char*)tiles.buf + (raw & 0x3FF)*tile_size, tiles_bpp,
+					(raw >> 10) & 1, (raw >> 11) & 1, palette.buf, palette.len / 4,
+					use_banks ? (raw >> 12) * 16 : 0, channels);
+		}
+		END_NOGIL()
+	}
+	PyBuffer_Release(&canvas);
+	PyBuffer_Release(&tiles);
+	PyBuffer_Release(&entries);
+	PyBuffer_Release(&palette);
+	if(error){
+		PyErr_SetString(error_type, error);
+		return NULL;
+	}
+	Py_RETURN_NONE;
+}
+
+
+// Draws a sprite tile to an RGBA canvas at (x, y), flipping it while copying and clipping it to the canvas.
+// Color 0 is transparent and leaves the canvas untouched, so sprites drawn later are layered on top.
+static void blit_sprite_tile(unsigned char* canvas, Py_ssize_t canvas_width, Py_ssize_t canvas_height,
+		Py_ssize_t x, Py_ssize_t y, const unsigned char* tile, unsigned int tile_bpp, int xflip, int yflip,
+		const unsigned char* palette, Py_ssize_t palette_count, unsigned int bank_base){
+	for(int row = 0;row<8;row++){
+		if(y + row < 0 || y + row >= canvas_height)
+			continue;
+		int sy = yflip ? 7-row : row;
+		for(int col = 0;col<8;col++){
+			if(x + col < 0 || x + col >= canvas_width)
+				continue;
+			int sx = xflip ? 7-col : col;
+			unsigned int pixel = tile_pixel(tile, tile_bpp, 8*sy + sx);
+			unsigned int index = bank_base + pixel;
+			if(!pixel || (Py_ssize_t)index >= palette_count)
+				continue;
+			unsigned char* out = canvas + 4*((y + row)*canvas_width + x + col);
+			memcpy(out, palette + 4*index, 4);
+		}
+	}
+}
+
+
+// OAM sizes in pixels by shape and size
+static const unsigned char oam_widths[3][4] = {{8, 16, 32, 64}, {16, 32, 32, 64}, {8, 8, 16, 32}};
+static const unsigned char oam_heights[3][4] = {{8, 16, 32, 64}, {8, 8, 16, 32}, {16, 32, 32, 64}};
+
+// Layout of one OAM record passed to draw_oams
+typedef struct {
+	int32_t x, y;  // canvas position of the OAM's top left corner
+	uint16_t attr0, attr1, attr2, unused;
+} oam_record;
+
+// draw_oams(canvas : writable bytes-like, canvas_width : int, canvas_height : int, tiles : bytes-like,
+//           tiles_bpp : int, char_bpp : int, oams : bytes-like of native "iiHHHH" records,
+//           palette : bytes-like of RGBA colors, mapping_type : int)
+// Draws OAMs to an RGBA canvas in the order they are given, later ones on top.
+// char_bpp is the depth of the NCGR the character numbers refer to, tiles_bpp the depth of the tile data.
+// mapping_type 0-3 maps characters in 1D with 32 << mapping_type byte boundaries, 4 maps them in a 2D 32x32 grid.
+// Affine OAMs are drawn without their transformation, hidden and OBJ window OAMs aren't drawn.
+static PyObject* draw_oams(PyObject *self, PyObject *args){
+	Py_buffer canvas, tiles, oams, palette;
+	unsigned int canvas_width, canvas_height, tiles_bpp, char_bpp, mapping_type;
+
+	if(!PyArg_ParseTuple(args, "w*IIy*IIy*y*I", &canvas, &canvas_width, &canvas_height, &tiles, &tiles_bpp,
+			&char_bpp, &oams, &palette, &mapping_type))
+		return NULL;
+
+	PyObject* error_type = PyExc_ValueError;
+	const char* error = NULL;
+	Py_ssize_t count = oams.len / (Py_ssize_t)sizeof(oam_record);
+	if(canvas.len < 4 * (Py_ssize_t)canvas_width * canvas_height)
+		error = "Canvas is too small";
+	else if(mapping_type > 4)
+		error = "Invalid mapping type";
+
+	if(!error){
+		Py_ssize_t tile_size = tiles_bpp == 8 ? 64 : 32;
+		Py_ssize_t tile_count = tiles.len / tile_size;
+		const oam_record* records = oams.buf;
+		BEGIN_NOGIL(count * 64)
+		for(Py_ssize_t i = 0;i<count && !error;i++){
+			oam_record oam = records[i];
+			int rot = (oam.attr0 >> 8) & 1;
+			int double_size = (oam.attr0 >> 9) & 1;
+			unsigned int shape = oam.attr0 >> 14;
+			unsigned int size = oam.attr1 >> 14;
+			if((!rot && double_size) || ((oam.attr0 >> 10) & 3) == 2)
+				continue;
+			if(shape == 3){
+				error = "OAM has invalid shape";
+				break;
+			}
+			int width = oam_widths[shape][size];
+			int height = oam_heights[shape][size];
+			int xflip = !rot && ((oam.attr1 >> 12) & 1);
+			int yflip = !rot && ((oam.attr1 >> 13) & 1);
+			Py_ssize_t x = oam.x + (double_size ? width/2 : 0);
+			Py_ssize_t y = oam.y + (double_size ? height/2 : 0);
+			int colors256 = (oam.attr0 >> 13) & 1;
+			unsigned int units = colors256 ? 2 : 1;  // 32-byte character units per tile
+			unsigned int bank_base = colors256 ? 0 : (oam.attr2 >> 12) * 16;
+			unsigned int chr = oam.attr2 & 0x3FF;
+
+			for(int ty = 0;ty<height/8 && !error;ty++){
+				for(int tx = 0;tx<width/8;tx++){
+					Py_ssize_t unit = mapping_type == 4 ? chr + 32*ty + units*tx
+							: ((Py_ssize_t)chr << mapping_type) + units*(ty*(width/8) + tx);
+					Py_ssize_t tile = char_bpp == 8 ? unit / 2 : unit;
+					if(tile >= tile_count){
+						error_type = PyExc_IndexError;
+						error = "Tile index out of range";
+						break;
+					}
+					Py_ssize_t dx = x + 8*(xflip ? width/8 - 1 - tx : tx);
+					Py_ssize_t dy = y + 8*(yflip ? height/8 - 1 - ty : ty);
+					blit_sprite_tile(canvas.buf, canvas_width, canvas_height, dx, dy,
+							(const unsigned char*)tiles.buf + tile*tile_size, tiles_bpp, xflip, yflip,
+							palette.buf, palette.len / 4, bank_base);
+				}
+			}
+		}
+		END_NOGIL()
+	}
+	PyBuffer_Release(&canvas);
+	PyBuffer_Release(&tiles);
+	PyBuffer_Release(&oams);
+	PyBuffer_Release(&palette);
+	if(error){
+		PyErr_SetString(error_type, error);
+		return NULL;
+	}
 	Py_RETURN_NONE;
 }
 
@@ -173,21 +855,42 @@ static PyMethodDef tileMethods[] = {
     {"_4bpp_to_8bpp", (PyCFunction)_4bpp_to_8bpp, METH_VARARGS, "Convert 4bpp bytes to 8bpp"},
     {"_8bpp_to_4bpp", (PyCFunction)_8bpp_to_4bpp, METH_VARARGS, "Convert 8bpp bytes to 4bpp"},
     {"flip_tile_data", (PyCFunction)flip_tile_data, METH_VARARGS, "Flip a tile"},
+    {"tile_flip_key", (PyCFunction)tile_flip_key, METH_VARARGS, "Get a flip-invariant key for a tile"},
+    {"tile_flip_keys", (PyCFunction)tile_flip_keys, METH_VARARGS, "Get the flip-invariant key of every tile"},
     {"read_ncbr_tile", (PyCFunction)read_ncbr_tile, METH_VARARGS, "Read a tile from ncbr"},
+    {"unpack_tiles", (PyCFunction)unpack_tiles, METH_VARARGS, "Read every tile from linear tile data"},
+    {"pack_tiles", (PyCFunction)pack_tiles, METH_VARARGS, "Pack header, every tile and trailer into bytes"},
     {"pack_ncbr_tiles", (PyCFunction)pack_ncbr_tiles, METH_VARARGS, "Pack list of bytes into ncbr"},
+    {"unpack_ncbr", (PyCFunction)unpack_ncbr, METH_VARARGS, "Convert a whole ncbr bitmap to tile order"},
+    {"pack_ncbr", (PyCFunction)pack_ncbr, METH_VARARGS, "Convert tiles to a whole ncbr bitmap"},
     {"draw_tile_to_buffer", (PyCFunction)draw_tile_to_buffer, METH_VARARGS, "Blit a tile to a bytearray"},
+    {"draw_tilemap", (PyCFunction)draw_tilemap, METH_VARARGS, "Draw a whole tilemap to a buffer"},
+    {"draw_tilemap_rgb", (PyCFunction)draw_tilemap_rgb, METH_VARARGS, "Draw a whole tilemap to an RGB(A) buffer"},
+    {"draw_oams", (PyCFunction)draw_oams, METH_VARARGS, "Draw sprite OAMs to an RGBA buffer"},
     {NULL, NULL, 0, NULL}
 };
 
+// The module keeps no state, so it can be shared by subinterpreters and run without the GIL.
+static PyModuleDef_Slot tileSlots[] = {
+#if PY_VERSION_HEX >= 0x030C0000
+    {Py_mod_multiple_interpreters, Py_MOD_PER_INTERPRETER_GIL_SUPPORTED},
+#endif
+#if PY_VERSION_HEX >= 0x030D0000
+    {Py_mod_gil, Py_MOD_GIL_NOT_USED},
+#endif
+    {0, NULL}
+};
+
 static struct PyModuleDef tilemodule = {
     PyModuleDef_HEAD_INIT,
     "tile",
     "Tile functions.",
-    -1,
-    tileMethods
+    0,
+    tileMethods,
+    tileSlots
 };
 
 PyMODINIT_FUNC PyInit_tile(void)
 {
-    return PyModule_Create(&tilemodule);
+    return PyModuleDef_Init(&tilemodule);
 }
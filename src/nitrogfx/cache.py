@@ -0,0 +1,144 @@
+import functools
+import hashlib
+import importlib.metadata
+import json
+import os
+import struct
+import tempfile
+
+CACHE_VERSION = 1
+"Part of every cache key, bumped when the cache's key or entry format changes"
+
+LOW_WATER = 0.9
+"Fraction of max_bytes the cache is shrunk to when it grows over its limit, so eviction doesn't run on every put"
+
+
+@functools.cache
+def _library_version() -> str | None:
+  try:
+    return importlib.metadata.version("nitrogfx-py")
+  except importlib.metadata.PackageNotFoundError:
+    return None
+
+
+class ConversionCache:
+  """Content-addressed on-disk cache for the outputs of conversions.
+  Entries are keyed on a hash of the input files' contents, the name of the conversion and its parameters,
+  so an entry is only reused when the conversion would produce exactly the same files.
+  Keys also include the installed library version, so outputs of an older version are never reused after an upgrade.
+  The least recently used entries are removed when the cache grows over its size limit.
+  Several processes can share a cache directory. Each process only counts its own writes between scans of the
+  directory, so a shared cache can briefly grow past its limit.
+  """
+
+  def __init__(self, directory: str, max_bytes: int = 1 << 30):
+    """:param directory: directory for the cache entries, created if it doesn't exist
+    :param max_bytes: total size of the entries to keep
+    """
+    self.directory = directory
+    self.max_bytes = max_bytes
+    self.__size = None  # estimated total size of the entries, None until the directory has been scanned
+    os.makedirs(directory, exist_ok=True)
+
+  @staticmethod
+  def key(op: str, inputs: list[bytes], params: dict = {}) -> str:
+    """Computes the cache key of a conversion
+    :param op: name of the conversion
+    :param inputs: contents of every input file, in a fixed order
+    :param params: conversion parameters, must be JSON-serializable
+    :return: hex digest
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps([CACHE_VERSION, _library_version(), op, params], sort_keys=True).encode())
+    for data in inputs:
+      h.update(struct.pack("<Q", len(data)))
+      h.update(data)
+    return h.hexdigest()
+
+  def __path(self, key: str) -> str:
+    return os.path.join(self.directory, key + ".bin")
+
+  def get(self, key: str) -> list[bytes] | None:
+    """Reads the outputs stored for a key and marks the entry as recently used
+    :param key: cache key
+    :return: list of output file contents, or None if the key isn't cached.
+    Truncated or corrupt entries are deleted and reported as not cached.
+    """
+    path = self.__path(key)
+    try:
+      with open(path, "rb") as f:
+        data = f.read()
+      os.utime(path)
+    except FileNotFoundError:
+      return None
+    sizes = self.__entry_sizes(data)
+    if sizes is None:
+      try:
+        os.remove(path)
+      except FileNotFoundError:
+        pass
+      return None
+    offset = 8 + 4 * len(sizes)
+    outputs = []
+    for size in sizes:
+      outputs.append(data[offset : offset + size])
+      offset += size
+    return outputs
+
+  @staticmethod
+  def __entry_sizes(data: bytes) -> tuple[int, ...] | None:
+    "Sizes of the outputs stored in an entry, or None if the entry is invalid"
+    if len(data) < 8 or data[:4] != b"NGCC":
+      return None
+    (count,) = struct.unpack_from("<I", data, 4)
+    if 8 + 4 * count > len(data):
+      return None
+    sizes = struct.unpack_from(f"<{count}I", data, 8)
+    if 8 + 4 * count + sum(sizes) != len(data):
+      return None
+    return sizes
+
+  def put(self, key: str, outputs: list[bytes]):
+    """Stores the outputs of a conversion, then evicts old entries if the cache has grown over its size limit
+    :param key: cache key
+    :param outputs: list of output file contents
+    """
+    header = b"NGCC" + struct.pack(f"<I{len(outputs)}I", len(outputs), *(len(data) for data in outputs))
+    data = header + b"".join(outputs)
+    fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+      f.write(data)
+    os.replace(tmp, self.__path(key))
+    if self.__size is None:
+      self.evict()
+    else:
+      self.__size += len(data)
+      if self.__size > self.max_bytes:
+        self.evict()
+
+  def evict(self):
+    """Scans the cache directory and, if the entries don't fit in max_bytes,
+    removes the least recently used ones until they fit in max_bytes * LOW_WATER"""
+    entries = []
+    total = 0
+    with os.scandir(self.directory) as it:
+      for entry in it:
+        if not entry.name.endswith(".bin"):
+          continue
+        try:
+          stat = entry.stat()
+        except FileNotFoundError:
+          continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total += stat.st_size
+    if total > self.max_bytes:
+      entries.sort()
+      for mtime, size, path in entries:
+        if total <= self.max_bytes * LOW_WATER:
+          break
+        try:
+          os.remove(path)
+        except FileNotFoundError:
+          pass
+        total -= size
+    self.__size = total
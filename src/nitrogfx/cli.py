@@ -0,0 +1,265 @@
+"""Command line interface for running batches of conversions, used by `python -m nitrogfx`.
+
+Jobs are given either as an operation and a list of input files or glob patterns:
+
+    python -m nitrogfx png-to-nscr "gfx/**/*.png" -o build/
+
+or as a JSON manifest holding a list of job objects:
+
+    python -m nitrogfx --manifest jobs.json
+
+Each job object has an "op", an "input" and optionally an "output" path, which is a base path without extension
+for operations producing several files. Any other keys are options of the operation, such as "bpp" or "nclr".
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from nitrogfx import convert
+from nitrogfx.cache import ConversionCache
+from nitrogfx.nanr import NANR
+from nitrogfx.ncer import NCER
+from nitrogfx.ncgr import NCGR
+from nitrogfx.nclr import NCLR
+from nitrogfx.nscr import NSCR
+from nitrogfx.util import json_load
+
+
+def _output_stem(job: dict) -> str:
+  "Input path without extension, moved to the output directory if there is one"
+  stem = os.path.splitext(job["input"])[0]
+  if job.get("output_dir"):
+    stem = os.path.join(job["output_dir"], os.path.basename(stem))
+  return stem
+
+
+def _sibling(job: dict, key: str) -> str | None:
+  "Path of a companion file, either given in the job or next to the input file with the same name"
+  if job.get(key):
+    return job[key]
+  path = os.path.splitext(job["input"])[0] + "." + key.upper()
+  return path if os.path.exists(path) else None
+
+
+def _load_nclr(job: dict) -> NCLR:
+  path = _sibling(job, "nclr")
+  return NCLR.load_from(path) if path else NCLR.get_monochrome_nclr()
+
+
+def _png_to_nscr(job: dict, outputs: list[str]):
+  ncgr, nscr, nclr = convert.png_to_nscr(job["input"], job.get("bpp", 8), job.get("use_flipping", True))
+  for obj, path in zip((ncgr, nscr, nclr), outputs):
+    obj.save_as(path)
+
+
+def _png_to_ncgr(job: dict, outputs: list[str]):
+  convert.png_to_ncgr(job["input"]).save_as(outputs[0])
+
+
+def _png_to_nclr(job: dict, outputs: list[str]):
+  convert.png_to_nclr(job["input"]).save_as(outputs[0])
+
+
+def _ncgr_to_png(job: dict, outputs: list[str]):
+  convert.ncgr_to_png(NCGR.load_from(job["input"]), outputs[0], _load_nclr(job))
+
+
+def _nscr_to_png(job: dict, outputs: list[str]):
+  ncgr_path = _sibling(job, "ncgr")
+  if ncgr_path is None:
+    raise FileNotFoundError(f"No NCGR found for {job['input']}")
+  ncgr = NCGR.load_from(ncgr_path)
+  convert.nscr_to_png(outputs[0], ncgr, NSCR.load_from(job["input"]), _load_nclr(job), job.get("mode", "P"))
+
+
+def _nclr_to_jasc(job: dict, outputs: list[str]):
+  convert.nclr_to_jasc(NCLR.load_from(job["input"]), outputs[0])
+
+
+def _jasc_to_nclr(job: dict, outputs: list[str]):
+  convert.jasc_to_nclr(job["input"]).save_as(outputs[0])
+
+
+def _ncer_to_json(job: dict, outputs: list[str]):
+  convert.ncer_to_json(NCER.load_from(job["input"]), outputs[0])
+
+
+def _json_to_ncer(job: dict, outputs: list[str]):
+  convert.json_to_ncer(job["input"]).save_as(outputs[0])
+
+
+def _nanr_to_json(job: dict, outputs: list[str]):
+  convert.nanr_to_json(NANR.load_from(job["input"]), outputs[0])
+
+
+def _json_to_nanr(job: dict, outputs: list[str]):
+  convert.json_to_nanr(job["input"]).save_as(outputs[0])
+
+
+# name: (function, extensions of the produced files, companion input files)
+OPERATIONS = {
+  "png-to-nscr": (_png_to_nscr, (".NCGR", ".NSCR", ".NCLR"), ()),
+  "png-to-ncgr": (_png_to_ncgr, (".NCGR",), ()),
+  "png-to-nclr": (_png_to_nclr, (".NCLR",), ()),
+  "ncgr-to-png": (_ncgr_to_png, (".png",), ("nclr",)),
+  "nscr-to-png": (_nscr_to_png, (".png",), ("ncgr", "nclr")),
+  "nclr-to-jasc": (_nclr_to_jasc, (".pal",), ()),
+  "jasc-to-nclr": (_jasc_to_nclr, (".NCLR",), ()),
+  "ncer-to-json": (_ncer_to_json, (".json",), ()),
+  "json-to-ncer": (_json_to_ncer, (".NCER",), ()),
+  "nanr-to-json": (_nanr_to_json, (".json",), ()),
+  "json-to-nanr": (_json_to_nanr, (".NANR",), ()),
+}
+"Conversions the command line interface can run, by name"
+
+
+def _outputs(job: dict) -> list[str]:
+  exts = OPERATIONS[job["op"]][1]
+  if len(exts) == 1:
+    return [job.get("output") or _output_stem(job) + exts[0]]
+  stem = job.get("output") or _output_stem(job)
+  return [stem + ext for ext in exts]
+
+
+def _cache_key(job: dict, cache: ConversionCache) -> str:
+  "Key of a job's outputs, made from the contents of its input files and its options"
+  companions = OPERATIONS[job["op"]][2]
+  inputs = []
+  for path in [job["input"]] + [_sibling(job, key) for key in companions]:
+    if path:
+      with open(path, "rb") as f:
+        inputs.append(f.read())
+    else:
+      inputs.append(b"")
+  skipped = ("input", "output", "output_dir") + companions
+  return cache.key(job["op"], inputs, {k: v for k, v in job.items() if k not in skipped})
+
+
+def run_job(job: dict, cache: ConversionCache | None = None) -> tuple[float, str | None, bool]:
+  """Runs a single conversion job
+  :param job: dict with "op" and "input" keys, and optionally "output" and operation options
+  :param cache: if given, the outputs are copied from it when the inputs and options haven't changed
+  :return: tuple of (elapsed seconds, error message or None, were the outputs found in the cache)
+  """
+  start = time.perf_counter()
+  error = None
+  cached = False
+  try:
+    function = OPERATIONS[job["op"]][0]
+    outputs = _outputs(job)
+    for path in outputs:
+      if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    if cache is None:
+      function(job, outputs)
+    else:
+      key = _cache_key(job, cache)
+      data = cache.get(key)
+      cached = data is not None and len(data) == len(outputs)
+      if cached:
+        for path, contents in zip(outputs, data):
+          with open(path, "wb") as f:
+            f.write(contents)
+      else:
+        function(job, outputs)
+        data = []
+        for path in outputs:
+          with open(path, "rb") as f:
+            data.append(f.read())
+        cache.put(key, data)
+  except Exception as e:
+    error = f"{type(e).__name__}: {e}"
+  return (time.perf_counter() - start, error, cached)
+
+
+def expand_jobs(op: str, patterns: list[str], output_dir: str | None = None, options: dict = {}) -> list[dict]:
+  """Creates a job for every file matching the glob patterns
+  :param op: name of the operation
+  :param patterns: file paths or glob patterns, ** matches subdirectories
+  :param output_dir: directory for the produced files. If None, they are written next to the inputs.
+  :param options: operation options added to every job
+  :return: list of job dicts
+  """
+  jobs = []
+  for pattern in patterns:
+    paths = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+    for path in paths:
+      jobs.append({"op": op, "input": path, "output_dir": output_dir, **options})
+  return jobs
+
+
+def run_jobs(
+  jobs: list[dict],
+  workers: int | None = None,
+  chunksize: int | None = None,
+  out=None,
+  cache: ConversionCache | None = None,
+) -> int:
+  """Runs conversion jobs across a process pool, reporting the result of each job in order
+  :param jobs: list of job dicts
+  :param workers: number of worker processes, defaults to the CPU count. With 1 the jobs run in this process.
+  :param chunksize: number of jobs sent to a worker at once, defaults to spreading the jobs in 4 chunks per worker
+  :param out: text stream for progress output, defaults to stdout
+  :param cache: ConversionCache for skipping jobs whose inputs haven't changed
+  :return: number of failed jobs
+  """
+  out = out or sys.stdout
+  workers = workers or os.cpu_count() or 1
+  chunksize = chunksize or max(1, len(jobs) // (workers * 4))
+  start = time.perf_counter()
+  failed = 0
+  run = partial(run_job, cache=cache)
+  if workers == 1:
+    results = map(run, jobs)
+  else:
+    executor = ProcessPoolExecutor(max_workers=workers)
+    results = executor.map(run, jobs, chunksize=chunksize)
+  try:
+    for i, (job, (elapsed, error, cached)) in enumerate(zip(jobs, results)):
+      status = f"FAILED {error}" if error else ("cached" if cached else "ok")
+      print(f"[{i + 1}/{len(jobs)}] {job['op']} {job['input']} {elapsed:.3f}s {status}", file=out)
+      failed += error is not None
+  finally:
+    if workers != 1:
+      executor.shutdown()
+  print(f"{len(jobs) - failed}/{len(jobs)} jobs done in {time.perf_counter() - start:.3f}s", file=out)
+  return failed
+
+
+def main(argv: list[str] | None = None) -> int:
+  """Entry point of `python -m nitrogfx`
+  :param argv: command line arguments, defaults to sys.argv[1:]
+  :return: exit code
+  """
+  parser = argparse.ArgumentParser(prog="python -m nitrogfx", description="Batch convert Nintendo DS graphics files.")
+  parser.add_argument("op", nargs="?", choices=sorted(OPERATIONS), help="conversion to run on the inputs")
+  parser.add_argument("inputs", nargs="*", help="input files or glob patterns")
+  parser.add_argument("-m", "--manifest", help="JSON file with a list of jobs, used instead of op and inputs")
+  parser.add_argument("-o", "--output-dir", help="directory for produced files, defaults to next to the inputs")
+  parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes")
+  parser.add_argument("--chunksize", type=int, default=None, help="number of jobs sent to a worker at once")
+  parser.add_argument("--cache", help="directory for caching outputs of jobs whose inputs haven't changed")
+  parser.add_argument("--cache-size", type=int, default=1024, help="maximum size of the cache in MiB")
+  parser.add_argument("--bpp", type=int, choices=(4, 8), default=8, help="bit depth for png-to-nscr")
+  parser.add_argument("--no-flipping", action="store_true", help="don't reuse flipped tiles in png-to-nscr")
+  args = parser.parse_args(argv)
+
+  if args.manifest:
+    jobs = json_load(args.manifest)
+    for job in jobs:
+      job.setdefault("output_dir", args.output_dir)
+  elif args.op:
+    options = {"bpp": args.bpp, "use_flipping": not args.no_flipping}
+    jobs = expand_jobs(args.op, args.inputs, args.output_dir, options)
+  else:
+    parser.error("either an operation or --manifest is required")
+  for job in jobs:
+    if job.get("op") not in OPERATIONS:
+      parser.error(f"unknown operation {job.get('op')!r}")
+  cache = ConversionCache(args.cache, args.cache_size << 20) if args.cache else None
+  return 1 if run_jobs(jobs, args.jobs, args.chunksize, cache=cache) else 0
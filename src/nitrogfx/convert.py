@@ -2,15 +2,17 @@ from PIL import Image
 
 from nitrogfx.nanr import NANR, SeqMode, SeqType, Sequence
 from nitrogfx.ncer import NCER, OAM, Cell
-from nitrogfx.ncgr import NCGR, Tile
+from nitrogfx.ncgr import NCGR, Tile, TileBuffer
 from nitrogfx.nclr import NCLR
-from nitrogfx.nscr import NSCR, MapEntry
+from nitrogfx.nscr import NSCR
 from nitrogfx.util import (
   TileCanvas,
   TilesetBuilder,
-  get_tile_data,
+  cells_to_img,
+  get_image_tiles,
   json_dump,
   json_load,
+  tilemap_to_img,
 )
 
 
@@ -69,39 +71,44 @@ def jasc_to_nclr(jasc_path: str) -> NCLR:
   return nclr
 
 
-def img_to_nscr(img: Image.Image, bpp: int = 8, use_flipping: bool = True) -> tuple[NCGR, NSCR, NCLR]:
+def img_to_nscr(
+  img: Image.Image, bpp: int = 8, use_flipping: bool = True, tileset: TilesetBuilder | None = None
+) -> tuple[NCGR, NSCR, NCLR]:
   """Creates a NCGR tileset, NSCR tilemap and NCLR palette from an indexed Pillow Image.
   4bpp images are currently not handled properly.
 
   :param img: indexed Pillow Image
   :param bpp: bits-per-pixel (4 for 16 colors, 8 for 256 colors)
   :param use_flipping: Flip tiles to reduce size of the tileset, at the cost of performance.
+    If False, only exact copies of tiles are reused.
+  :param tileset: TilesetBuilder shared between several images. The returned NCGR holds every tile added to it so far.
+    If None, a new one is created. Its own flipping mode is used instead of use_flipping.
   :return: tuple of (NCGR, NSCR, NCLR)
   """
   nclr = img_to_nclr(img)
   nclr.is8bpp = bpp == 8
 
-  tileset = TilesetBuilder()
+  if tileset is None:
+    tileset = TilesetBuilder(use_flipping)
   tileset.add(Tile([0 for i in range(64)]))
 
   nscr = NSCR(img.width, img.height, bpp == 8)
-  img_pixels = img.load()
-  for y in range(0, img.height, 8):
-    for x in range(0, img.width, 8):
-      tile = get_tile_data(img_pixels, x, y)
-      nscr.set_entry(x // 8, y // 8, tileset.get_map_entry(tile))
+  nscr.entries = tileset.get_map_entries(get_image_tiles(img))
 
   return (tileset.as_ncgr(bpp), nscr, nclr)
 
 
-def png_to_nscr(png_name: str, bpp: int = 8, use_flipping: bool = True) -> tuple[NCGR, NSCR, NCLR]:
+def png_to_nscr(
+  png_name: str, bpp: int = 8, use_flipping: bool = True, tileset: TilesetBuilder | None = None
+) -> tuple[NCGR, NSCR, NCLR]:
   """Creates a NCGR tileset, NSCR tilemap and NCLR palette from an indexed PNG.
   :param png_name: Path to indexed PNG
   :param bpp: bits-per-pixel (4 for 16 colors, 8 for 256 colors)
   :param use_flipping: Flip tiles to reduce size of the tileset, at the cost of performance.
+  :param tileset: TilesetBuilder shared between several images, see img_to_nscr
   :return: tuple of (NCGR, NSCR, NCLR)
   """
-  return img_to_nscr(Image.open(png_name), bpp, use_flipping)
+  return img_to_nscr(Image.open(png_name), bpp, use_flipping, tileset)
 
 
 def nclr_to_imgpal(nclr: NCLR, index: int = 0) -> list[int]:
@@ -124,10 +131,7 @@ def ncgr_to_img(ncgr: NCGR, nclr: NCLR = NCLR.get_monochrome_nclr()) -> Image.Im
   :return: Pillow Image
   """
   canvas = TileCanvas(ncgr.width * 8, ncgr.height * 8)
-  for y in range(ncgr.height):
-    for x in range(ncgr.width):
-      entry = MapEntry(y * ncgr.width + x)
-      canvas.draw_tile(ncgr, entry, x * 8, y * 8)
+  canvas.draw_tileset(ncgr)
   return canvas.as_img(nclr)
 
 
@@ -139,55 +143,83 @@ def ncgr_to_png(ncgr: NCGR, img_name: str, nclr: NCLR = NCLR.get_monochrome_nclr
   ncgr_to_img(ncgr, nclr).save(img_name, "PNG")
 
 
-def img_to_ncgr(img: Image.Image, _8bpp=True) -> NCGR:
+def img_to_ncgr(img: Image.Image, _8bpp=True, contiguous: bool = False) -> NCGR:
   """Produces an NCGR tileset from an indexed Pillow Image.
 
   :param img: Pillow Image with indexed colors
   :param _8bpp: Sets bpp field of NCGR object
+  :param contiguous: store the tiles in a TileBuffer instead of a list of Tile objects
   :return: NCGR object
   """
   ncgr = NCGR(8 if _8bpp else 4)
   ncgr.width = img.width // 8
   ncgr.height = img.height // 8
-  img_pixels = img.load()
-  for y in range(0, img.height, 8):
-    for x in range(0, img.width, 8):
-      ncgr.tiles.append(get_tile_data(img_pixels, x, y))
+  data = get_image_tiles(img)
+  if contiguous:
+    ncgr.tiles = TileBuffer(data)
+  else:
+    ncgr.tiles = [Tile(bytes(data[i : i + 0x40])) for i in range(0, len(data), 0x40)]
   return ncgr
 
 
-def png_to_ncgr(img_name: str) -> NCGR:
+def png_to_ncgr(img_name: str, contiguous: bool = False) -> NCGR:
   """Runs img_to_ncgr with a PNG file
   :param img_name: Path to input PNG file
+  :param contiguous: store the tiles in a TileBuffer instead of a list of Tile objects
   :return: NCGR object
   """
-  return img_to_ncgr(Image.open(img_name))
+  return img_to_ncgr(Image.open(img_name), contiguous=contiguous)
 
 
-def nscr_to_img(ncgr: NCGR, nscr: NSCR, nclr: NCLR = NCLR.get_monochrome_nclr()) -> Image.Image:
+def nscr_to_img(ncgr: NCGR, nscr: NSCR, nclr: NCLR = NCLR.get_monochrome_nclr(), mode: str = "P") -> Image.Image:
   """Produces an image from a tilemap, tileset and palette
 
   :param ncgr: NCGR tileset
   :param nscr: NSCR tilemap
   :param nclr: NCLR palette
+  :param mode: "P" for an indexed image using the first 256 colors of the palette.
+    "RGB" or "RGBA" apply each entry's palette bank on 4bpp tilemaps, RGBA makes color 0 transparent.
   :return: Pillow Image
   """
+  if mode != "P":
+    return tilemap_to_img(ncgr, nscr, nclr, mode)
   canvas = TileCanvas(nscr.width, nscr.height)
-  for y in range(nscr.height // 8):
-    for x in range(nscr.width // 8):
-      entry = nscr.get_entry(x, y)
-      canvas.draw_tile(ncgr, entry, x * 8, y * 8)
+  canvas.draw_tilemap(ncgr, nscr)
   return canvas.as_img(nclr)
 
 
-def nscr_to_png(img_name: str, ncgr: NCGR, nscr: NSCR, nclr: NCLR = NCLR.get_monochrome_nclr()):
+def nscr_to_png(img_name: str, ncgr: NCGR, nscr: NSCR, nclr: NCLR = NCLR.get_monochrome_nclr(), mode: str = "P"):
   """Stores result of nscr_to_img in a png file
   :param img_name: Path to produced PNG file
   :param ncgr: NCGR tileset
   :param nscr: NSCR tilemap
   :param nclr: NCLR palette
+  :param mode: image mode passed to nscr_to_img
   """
-  nscr_to_img(ncgr, nscr, nclr).save(img_name, "PNG")
+  nscr_to_img(ncgr, nscr, nclr, mode).save(img_name, "PNG")
+
+
+def cell_to_img(cell: Cell, ncgr: NCGR, nclr: NCLR, mapping_type: int = 0) -> Image.Image:
+  """Renders a sprite cell to an RGBA image just big enough for its OAMs. Color 0 is transparent.
+  :param cell: Cell object
+  :param ncgr: NCGR tileset
+  :param nclr: NCLR palette
+  :param mapping_type: character mapping of the NCER the cell is from
+  :return: Pillow Image
+  """
+  return cells_to_img([cell], ncgr, nclr, mapping_type)
+
+
+def ncer_to_img(ncer: NCER, ncgr: NCGR, nclr: NCLR, columns: int = 16) -> Image.Image:
+  """Renders every cell of an NCER into an RGBA sprite sheet. Color 0 is transparent.
+  Cells are drawn in equally sized frames sharing the same origin, so they line up when played as an animation.
+  :param ncer: NCER object
+  :param ncgr: NCGR tileset
+  :param nclr: NCLR palette
+  :param columns: number of cells per row
+  :return: Pillow Image
+  """
+  return cells_to_img(ncer.cells, ncgr, nclr, ncer.mapping_type, columns)
 
 
 def json_to_ncer(filename: str) -> NCER:
@@ -303,7 +335,7 @@ def nanr_to_json(nanr: NANR, json_filename: str):
       "first_frame": seq.first_frame,
       "type": str(seq.type)[8:],
       "mode": str(seq.mode)[8:],
-      "frames": [vars(frame) for frame in seq.frames],
+      "frames": [{name: getattr(frame, name) for name in frame.__slots__} for frame in seq.frames],
     }
 
   obj = {"anims": [seq_to_json(seq) for seq in nanr.anims], "texu": nanr.texu, "labels": nanr.labels}
@@ -330,7 +362,7 @@ def json_to_nanr(json_filename: str) -> NANR:
     for frame in json["frames"]:
       f = seq.add_frame()
       for key in frame.keys():
-        f.__dict__.update({key: frame[key]})
+        setattr(f, key, frame[key])
     return seq
 
   data = json_load(json_filename)
@@ -1,29 +1,46 @@
 import struct
 from enum import Enum
 
-from nitrogfx.util import pack_labels, pack_nitro_header, pack_txeu, unpack_labels
+from nitrogfx.util import (
+  find_section,
+  map_file,
+  pack_labels,
+  pack_nitro_header,
+  pack_txeu,
+  slots_equal,
+  unpack_labels,
+)
 
 
 class Frame0:
   "Sequence frame type with only index and duration"
 
+  __slots__ = ("index", "padding", "duration")
+
   def __init__(self):
     self.index = 0
     self.padding = 0
     self.duration = 0
 
+  _struct = struct.Struct("<HH")
+
   def pack(self):
-    return struct.pack("<HH", self.index, self.padding)
+    return self._struct.pack(self.index, self.padding)
 
   @staticmethod
   def unpack(data: bytes) -> "Frame0":
+    return Frame0.unpack_from(data)
+
+  @staticmethod
+  def unpack_from(data, offset: int = 0) -> "Frame0":
+    "Unpacks a frame starting at offset of a bytes-like object without slicing it"
     frame = Frame0()
-    frame.index, frame.padding = struct.unpack("<HH", data[0:4])
+    frame.index, frame.padding = Frame0._struct.unpack_from(data, offset)
     frame.duration = 0  # not included in the same data
     return frame
 
   def __eq__(self, other):
-    return vars(self) == vars(other)
+    return slots_equal(self, other)
 
   def __repr__(self):
     return f"<Frame0: index={self.index} unk={self.padding} duration={self.duration}>"
@@ -32,6 +49,8 @@ class Frame0:
 class Frame1:
   "Sequence frame type with all parameters"
 
+  __slots__ = ("index", "rotZ", "sx", "sy", "px", "py", "duration")
+
   def __init__(self):
     self.index = 0
     self.rotZ = 0
@@ -41,19 +60,26 @@ class Frame1:
     self.py = 0
     self.duration = 0
 
+  _struct = struct.Struct("<HHIIHH")
+
   def pack(self):
     f = self
-    return struct.pack(">HHIIHH", f.index, f.rotZ, f.sx, f.sy, f.px, f.py)
+    return self._struct.pack(f.index, f.rotZ, f.sx, f.sy, f.px, f.py)
 
   @staticmethod
   def unpack(data: bytes) -> "Frame1":
+    return Frame1.unpack_from(data)
+
+  @staticmethod
+  def unpack_from(data, offset: int = 0) -> "Frame1":
+    "Unpacks a frame starting at offset of a bytes-like object without slicing it"
     f = Frame1()
-    f.index, f.rotZ, f.sx, f.sy, f.px, f.py = struct.unpack("<HHIIHH", data[0:16])
+    f.index, f.rotZ, f.sx, f.sy, f.px, f.py = Frame1._struct.unpack_from(data, offset)
     f.duration = 0  # not included in the same data
     return f
 
   def __eq__(self, other):
-    return vars(self) == vars(other)
+    return slots_equal(self, other)
 
   def __repr__(self):
     return f"<Frame1: index={self.index} rotZ={self.rotZ} (sx,sy)={(self.sx, self.sy)} (px,py)={(self.px, self.py)} duration={self.duration}>"
@@ -62,29 +88,42 @@ class Frame1:
 class Frame2:
   "Sequence frame type with index, px, py and duration"
 
+  __slots__ = ("index", "px", "py", "duration")
+
   def __init__(self):
     self.index = 0
     self.px = 0
     self.py = 0
     self.duration = 0
 
+  _struct = struct.Struct("<HHHH")
+
   def pack(self):
-    return struct.pack("<HHHH", self.index, 0, self.px, self.py)
+    return self._struct.pack(self.index, 0, self.px, self.py)
 
   @staticmethod
   def unpack(data: bytes) -> "Frame2":
+    return Frame2.unpack_from(data)
+
+  @staticmethod
+  def unpack_from(data, offset: int = 0) -> "Frame2":
+    "Unpacks a frame starting at offset of a bytes-like object without slicing it"
     f = Frame2()
-    f.index, unused, f.px, f.py = struct.unpack("<HHHH", data[0:8])
+    f.index, unused, f.px, f.py = Frame2._struct.unpack_from(data, offset)
     f.duration = 0  # not included in the same data
     return f
 
   def __eq__(self, other):
-    return vars(self) == vars(other)
+    return slots_equal(self, other)
 
   def __repr__(self):
     return f"<Frame2: index={self.index} (px,py)={(self.px, self.py)} duration={self.duration}>"
 
 
+FRAME_TYPES = {0: Frame0, 1: Frame1, 2: Frame2}
+"Frame classes by Sequence.frame_type"
+
+
 class SeqMode(Enum):
   "Sequence mode values"
 
@@ -104,6 +143,8 @@ class SeqType(Enum):
 class Sequence:
   "NANR animation sequence"
 
+  __slots__ = ("first_frame", "type", "mode", "frame_type", "frames")
+
   def __init__(self):
     self.first_frame = 0
     self.type = SeqType.CELL
@@ -116,21 +157,19 @@ class Sequence:
     :param data: packed frame data
     :param duration: duration value given to frame object
     """
-    frame_class = {0: Frame0, 1: Frame1, 2: Frame2}[self.frame_type]
-    frame = frame_class.unpack(data)
+    frame = FRAME_TYPES[self.frame_type].unpack(data)
     frame.duration = duration
     self.frames.append(frame)
 
   def add_frame(self):
     """Adds a frame of self.frame_type to self.frames
     :return: the newly added Frame0/Frame1/Frame2 object"""
-    frame_class = {0: Frame0, 1: Frame1, 2: Frame2}[self.frame_type]
-    frame = frame_class()
+    frame = FRAME_TYPES[self.frame_type]()
     self.frames.append(frame)
     return frame
 
   def __eq__(self, other):
-    return vars(self) == vars(other)
+    return slots_equal(self, other)
 
 
 class NANR:
@@ -143,40 +182,55 @@ class NANR:
 
   def total_frames(self):
     ":return: total number of frames in all sequences"
-    return len([frame for anim in self.anims for frame in anim.frames])
-
-  def __pack_frames(self):
-    packed_frame_refs = b""
-    packed_frames = b""
+    return sum(len(anim.frames) for anim in self.anims)
+
+  def __pack_frames(self, frame_cnt: int):
+    # Identical frame records are stored once, found by their whole record in a dict of offsets.
+    # Frame0 records are found by their index alone, which may be any aligned halfword of the frame data:
+    # their padding is ignored, so consecutive Frame0 records overlap like in files made by the official tools.
+    packed_frame_refs = bytearray(8 * frame_cnt)
+    packed_frames = bytearray(16 * frame_cnt)
+    offsets: dict[bytes, int] = {}
+    size = 0
+    ref_ofs = 0
     for anim in self.anims:
       for frame in anim.frames:
         packed = frame.pack()
-        to_find = packed[0:2] if isinstance(frame, Frame0) else packed  # ignores padding bytes on Frame0
-        packed_found_at = packed_frames.find(to_find)
-        if packed_found_at == -1:
-          packed_found_at = len(packed_frames)
-          packed_frames += packed
-        packed_frame_refs += struct.pack("<IHH", packed_found_at, frame.duration, 0xBEEF)
-    return packed_frame_refs + packed_frames
+        packed_found_at = offsets.get(packed[0:2] if isinstance(frame, Frame0) else packed)
+        if packed_found_at is None:
+          packed_found_at = size
+          offsets.setdefault(packed, size)
+          for i in range(0, len(packed), 2):
+            offsets.setdefault(packed[i : i + 2], size + i)
+          packed_frames[size : size + len(packed)] = packed
+          size += len(packed)
+        struct.pack_into("<IHH", packed_frame_refs, ref_ofs, packed_found_at, frame.duration, 0xBEEF)
+        ref_ofs += 8
+    return bytes(packed_frame_refs) + bytes(packed_frames[:size])
 
   def pack(self):
     """Pack NANR into bytes
     :return: bytes"""
+    total_frames = self.total_frames()
     frame_ref_start = len(self.anims) * 16 + 0x18
-    frame_data_start = frame_ref_start + 8 * self.total_frames()
+    frame_data_start = frame_ref_start + 8 * total_frames
 
-    packed_anims = b""
+    packed_anims = bytearray(16 * len(self.anims))
+    frame_addr = 0  # offset of the sequence's first frame reference
     for i, anim in enumerate(self.anims):
-      packed_anims += struct.pack(
+      struct.pack_into(
         "<HHHHII",
+        packed_anims,
+        16 * i,
         len(anim.frames),
         anim.first_frame,
         anim.frame_type,
         anim.type.value,
         anim.mode.value,
-        i * self.total_frames(),
+        frame_addr,
       )
-    knba_sect = packed_anims + self.__pack_frames()
+      frame_addr += 8 * len(anim.frames)
+    knba_sect = bytes(packed_anims) + self.__pack_frames(total_frames)
 
     lbal = pack_labels(self.labels) if len(self.labels) > 0 else b""
     txeu = pack_txeu(self.texu)
@@ -184,7 +238,7 @@ class NANR:
     total_size = len(knba_sect) + len(lbal) + len(txeu) + 0x20
     header = pack_nitro_header("RNAN", total_size, 3)
     header2 = b"KNBA" + struct.pack(
-      "<IHHIII", len(knba_sect) + 0x20, len(self.anims), self.total_frames(), 0x18, frame_ref_start, frame_data_start
+      "<IHHIII", len(knba_sect) + 0x20, len(self.anims), total_frames, 0x18, frame_ref_start, frame_data_start
     )
     header2 += struct.pack("II", 0, 0)  # padding
     return header + header2 + knba_sect + lbal + txeu
@@ -197,37 +251,44 @@ class NANR:
     """
     nanr = NANR()
     assert data[0x10:0x14] == b"KNBA", "NANR header must start with magic KNBA"
-    sectsize, animcnt, total_frames, unk1, frame_ref_start, frame_data_start = struct.unpack(
-      "<IHHIII", data[0x14 : 0x14 + 20]
-    )
-
-    for i in range(animcnt):
-      frame_offs = unk1 + 0x18 + 16 * i
+    sectsize, animcnt, total_frames, unk1, frame_ref_start, frame_data_start = struct.unpack_from("<IHHIII", data, 0x14)
+
+    view = memoryview(data)
+    anim_start = unk1 + 0x18
+    frame_ref_start += 0x18
+    frame_data_start += 0x18
+    for framecnt, first_frame, frame_type, seqtype, seqmode, frame_addr in struct.iter_unpack(
+      "<HHHHII", view[anim_start : anim_start + 16 * animcnt]
+    ):
       seq = Sequence()
-      framecnt, seq.first_frame, seq.frame_type, seqtype, seqmode, frame_addr = struct.unpack(
-        "<HHHHII", data[frame_offs : frame_offs + 16]
-      )
+      seq.first_frame = first_frame
+      seq.frame_type = frame_type
       seq.mode = SeqMode(seqmode)
       seq.type = SeqType(seqtype)
-      for j in range(framecnt):
-        frame_ref_ofs = frame_ref_start + 0x18 + frame_addr + 8 * j
-        anim_data_ofs, duration = struct.unpack("<IH", data[frame_ref_ofs : frame_ref_ofs + 6])
-        frame_start = anim_data_ofs + frame_data_start + 0x18
-        seq.add_frame_from_bytes(data[frame_start:], duration)
+      unpack_frame = FRAME_TYPES[frame_type].unpack_from
+      refs = view[frame_ref_start + frame_addr : frame_ref_start + frame_addr + 8 * framecnt]
+      for anim_data_ofs, duration, unused in struct.iter_unpack("<IHH", refs):
+        frame = unpack_frame(data, anim_data_ofs + frame_data_start)
+        frame.duration = duration
+        seq.frames.append(frame)
       nanr.anims.append(seq)
 
     lbal_start = sectsize + 0x10
     if data[lbal_start : lbal_start + 4] == b"LBAL":
       nanr.labels = unpack_labels(data[lbal_start:])
-    nanr.texu = data[data.find(b"TXEU", lbal_start) + 0x8]
+    nanr.texu = data[find_section(data, b"TXEU", lbal_start) + 0x8]
     return nanr
 
   @staticmethod
-  def load_from(filepath: str) -> "NANR":
+  def load_from(filepath: str, mmap: bool = False) -> "NANR":
     """Read data from a NANR file
     :param filename: path to NCGR file
+    :param mmap: memory-map the file instead of reading it into memory
     :return: NANR object
     """
+    if mmap:
+      with map_file(filepath) as data:
+        return NANR.unpack(data)
     with open(filepath, "rb") as f:
       return NANR.unpack(f.read())
 
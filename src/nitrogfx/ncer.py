@@ -37,35 +37,34 @@ class NCER:
     ncer.mapping_type = mapping
     ncer.extended = extended == 1
 
+    view = memoryview(data)
     cell_len = 0x10 if ncer.extended else 8
     oam_start = 0x30 + cell_len * cell_cnt
-    for i in range(cell_cnt):
+    cell_table = view[0x30:oam_start]
+    for cell in struct.iter_unpack("<HHIhhhh" if ncer.extended else "<HHI", cell_table):
       c = Cell()
-      start = 0x30 + cell_len * i
       if ncer.extended:
-        n, c.readOnly, p, c.max_x, c.max_y, c.min_x, c.min_y = struct.unpack("<HHIhhhh", data[start : start + 0x10])
+        n, c.readOnly, p, c.max_x, c.max_y, c.min_x, c.min_y = cell
       else:
-        n, c.readOnly, p = struct.unpack("<HHI", data[start : start + 8])
-      for j in range(n):
-        oam_ptr = oam_start + p + 6 * j
-        c.oam.append(OAM.unpack(data[oam_ptr : oam_ptr + 6]))
+        n, c.readOnly, p = cell
+      oam_table = view[oam_start + p : oam_start + p + 6 * n]
+      c.oam = [OAM.from_attrs(a0, a1, a2) for a0, a1, a2 in struct.iter_unpack("<HHH", oam_table)]
       ncer.cells.append(c)
 
     if partition_data_offset > 0:
       pos = 0x18 + partition_data_offset
-      max_partition_size, first_partition_data_offset = struct.unpack("<II", data[pos : pos + 8])
+      max_partition_size, first_partition_data_offset = struct.unpack_from("<II", data, pos)
       pos += first_partition_data_offset
-      for i in range(cell_cnt):
-        cell = ncer.cells[i]
-        cell.partition_offset, cell.partition_size = struct.unpack("<II", data[pos : pos + 8])
-        pos += 8
+      partitions = struct.iter_unpack("<II", view[pos : pos + 8 * cell_cnt])
+      for cell, (offset, size) in zip(ncer.cells, partitions):
+        cell.partition_offset, cell.partition_size = offset, size
 
     if data[0xE] == 3:  # has labels sections
       labl_start = 0x10 + cell_size
       if data[labl_start : labl_start + 4] != b"LBAL":
-        raise Exception("Label section doesn't start with LBAL" + str(data[labl_start:]))
+        raise Exception("Label section doesn't start with LBAL" + str(bytes(data[labl_start:])))
       labl_size = struct.unpack("<I", data[labl_start + 4 : labl_start + 8])[0]
-      labl_data = data[labl_start : labl_start + labl_size].split(b"\00")
+      labl_data = bytes(data[labl_start : labl_start + labl_size]).split(b"\00")
 
       label_data_found = 8
       for label in labl_data[-2::-1]:
@@ -75,7 +74,7 @@ class NCER:
         if label_data_found == labl_size:
           break
       ncer.labels.reverse()
-      ncer.texu = data[data.find(b"TXEU", labl_start) + 0x8]
+      ncer.texu = data[util.find_section(data, b"TXEU", labl_start) + 0x8]
 
     return ncer
 
@@ -96,30 +95,41 @@ class NCER:
       "<IIHHII", 0x4345424B, cell_size + 0x20, len(self.cells), self.extended, 0x18, self.mapping_type
     )
     header2 += struct.pack("III", 0, 0, 0)
-    oamdata = b""
-    celldata = b""
+    celldata = bytearray((0x10 if self.extended else 8) * len(self.cells))
+    oamdata = bytearray(6 * sum(len(cell.oam) for cell in self.cells))
     oam_ptr = 0
     for i, cell in enumerate(self.cells):
       if self.extended:
-        celldata += struct.pack(
-          "<HHIhhhh", len(cell.oam), cell.readOnly, oam_ptr, cell.max_x, cell.max_y, cell.min_x, cell.min_y
+        struct.pack_into(
+          "<HHIhhhh",
+          celldata,
+          16 * i,
+          len(cell.oam),
+          cell.readOnly,
+          oam_ptr,
+          cell.max_x,
+          cell.max_y,
+          cell.min_x,
+          cell.min_y,
         )
       else:
-        celldata += struct.pack("<HHI", len(cell.oam), cell.readOnly, oam_ptr)
+        struct.pack_into("<HHI", celldata, 8 * i, len(cell.oam), cell.readOnly, oam_ptr)
       for oam in cell.oam:
-        oamdata += oam.pack()
+        struct.pack_into("<HHH", oamdata, oam_ptr, *oam.to_attrs())
         oam_ptr += 6
 
     if not use_labels:
       return header + header2 + celldata + oamdata
 
     labl = b"\00" * cell_padding_bytes + struct.pack("<II", 0x4C41424C, labl_size + 8)
-    allLabels = b""
+    encoded = [label.encode("ascii") + b"\00" for label in self.labels]
+    positions = []
     pos = 0
-    for label in self.labels:
-      labl += struct.pack("<I", pos)
-      allLabels += label.encode("ascii") + b"\00"
-      pos += len(label) + 1
+    for label in encoded:
+      positions.append(pos)
+      pos += len(label)
+    labl += struct.pack(f"<{len(positions)}I", *positions)
+    allLabels = b"".join(encoded)
 
     texu = bytes([0x54, 0x58, 0x45, 0x55, 0x0C, 0x00, 0x00, 0x00, self.texu, 0x00, 0x00, 0x00])
     return header + header2 + celldata + oamdata + labl + allLabels + texu
@@ -132,11 +142,15 @@ class NCER:
       f.write(self.pack())
 
   @staticmethod
-  def load_from(filename: str) -> "NCER":
+  def load_from(filename: str, mmap: bool = False) -> "NCER":
     """Load NCER from file.
     :param filename: Path to NCER file.
+    :param mmap: memory-map the file instead of reading it into memory
     :return: NCER object
     """
+    if mmap:
+      with util.map_file(filename) as data:
+        return NCER.unpack(data)
     with open(filename, "rb") as f:
       return NCER.unpack(f.read())
 
@@ -145,6 +159,8 @@ class NCER:
 
 
 class Cell:
+  __slots__ = ("oam", "readOnly", "max_x", "min_x", "min_y", "max_y", "partition_offset", "partition_size")
+
   def __init__(self):
     self.oam = []
     self.readOnly = 0
@@ -156,7 +172,7 @@ class Cell:
     self.partition_size = 0
 
   def __eq__(self, other) -> bool:
-    return vars(self) == vars(other)
+    return util.slots_equal(self, other)
 
 
 class OAM:
@@ -177,6 +193,23 @@ class OAM:
     (2, 3): (32, 64),
   }
 
+  # fields of attr0, attr1 and attr2
+  __slots__ = (
+    "y",
+    "rot",
+    "sizeDisable",
+    "mode",
+    "mosaic",
+    "colors",
+    "shape",
+    "x",
+    "rotsca",
+    "size",
+    "char",
+    "prio",
+    "pal",
+  )
+
   def __init__(self):
     # attr0
     self.y = 0
@@ -215,27 +248,38 @@ class OAM:
         return
     raise Exception("Invalid OAM size: " + str(dimensions))
 
+  def to_attrs(self) -> tuple[int, int, int]:
+    ":return: the three 16-bit OAM attributes"
+    attr0 = (
+      (self.y & 0xFF)
+      | (int(self.rot) << 8)
+      | (self.sizeDisable << 9)
+      | (self.mode << 10)
+      | (self.mosaic << 12)
+      | ((self.colors != 16) << 13)
+      | (self.shape << 14)
+    )
+    attr1 = (self.x & 0x1FF) | (self.rotsca << 9) | (self.size << 14)
+    attr2 = (self.char & 0xFF) | (((self.char >> 8) | (self.prio << 2) | (self.pal << 4)) << 8)
+    return (attr0, attr1, attr2)
+
   def pack(self):
     ":return: bytes"
-    attr00 = self.y & 0xFF
-    attr01 = (
-      int(self.rot)
-      | (self.sizeDisable << 1)
-      | (self.mode << 2)
-      | (self.mosaic << 4)
-      | (0 if self.colors == 16 else 32)
-      | (self.shape << 6)
-    )
-    attr10 = self.x & 0xFF
-    attr11 = ((self.x >> 8) & 1) | (self.rotsca << 1) | (self.size << 6)
-    attr20 = self.char & 0xFF
-    attr21 = (self.char >> 8) | (self.prio << 2) | (self.pal << 4)
-    return bytes([attr00, attr01, attr10, attr11, attr20, attr21])
+    return struct.pack("<HHH", *self.to_attrs())
 
   @staticmethod
   def unpack(data: bytes) -> "OAM":
     ":return: OAM object"
-    a0, a1, a2 = struct.unpack("<HHH", data)
+    return OAM.from_attrs(*struct.unpack("<HHH", data))
+
+  @staticmethod
+  def from_attrs(a0: int, a1: int, a2: int) -> "OAM":
+    """Creates an OAM from its attributes
+    :param a0: attribute 0
+    :param a1: attribute 1
+    :param a2: attribute 2
+    :return: OAM object
+    """
     self = OAM()
     self.y = a0 & 0xFF
     self.rot = a0 & 0x100 > 0
@@ -253,4 +297,4 @@ class OAM:
     return self
 
   def __eq__(self, other) -> bool:
-    return vars(self) == vars(other)
+    return util.slots_equal(self, other)
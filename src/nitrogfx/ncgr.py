@@ -1,4 +1,5 @@
 import struct
+from collections.abc import MutableSequence
 
 import nitrogfx.c_ext.tile as c_ext
 import nitrogfx.util as util
@@ -29,12 +30,178 @@ class Tile:
     return self.pixels == other.pixels
 
 
+class TileView(Tile):
+  """Tile backed by a window of a TileBuffer. Reads and writes go straight to the buffer.
+  Views of packed 4bpp buffers only expand their pixels when they are read."""
+
+  def __init__(self, buffer: "TileBuffer", index: int):
+    self.__buffer = buffer
+    self.__offset = index * buffer.tile_size
+
+  @property
+  def pixels(self) -> bytes:
+    raw = bytes(self.__buffer.data[self.__offset : self.__offset + self.__buffer.tile_size])
+    return c_ext._4bpp_to_8bpp(raw) if self.__buffer.bpp == 4 else raw
+
+  @pixels.setter
+  def pixels(self, pixels: bytes):
+    if len(pixels) != 64:
+      raise ValueError("Tiles must be 64 bytes long.")
+    if self.__buffer.bpp == 4:
+      pixels = c_ext._8bpp_to_4bpp(pixels)
+    self.__buffer.data[self.__offset : self.__offset + self.__buffer.tile_size] = pixels
+
+  def get_pixel(self, x, y) -> int:
+    i = x + y * 8
+    if self.__buffer.bpp == 4:
+      val = self.__buffer.data[self.__offset + i // 2]
+      return val >> 4 if i & 1 else val & 0xF
+    return self.__buffer.data[self.__offset + i]
+
+
+class TileBuffer(MutableSequence):
+  """Contiguous tile storage backed by a single bytearray.
+  With bpp=8 tile i is the 64-byte window of 8bpp pixels at i * 64.
+  With bpp=4 tiles are kept in their packed 32-byte NCGR form and expanded only when pixels are read.
+  Behaves like a list of tiles, but hands out TileView objects instead of storing Tile objects.
+  A view refers to a position in the buffer, so inserting or deleting tiles before it changes which tile it shows.
+  """
+
+  def __init__(self, data: bytes = b"", bpp: int = 8):
+    """:param data: tile data, 64 bytes per tile for 8bpp or 32 bytes per tile for 4bpp
+    :param bpp: storage depth of data (4 or 8)
+    """
+    self.bpp = bpp
+    self.tile_size = 0x40 if bpp == 8 else 0x20
+    if len(data) % self.tile_size != 0:
+      raise ValueError(f"Tile data length must be a multiple of {self.tile_size} bytes.")
+    self.data = bytearray(data)
+
+  @staticmethod
+  def from_tiles(tiles: list[Tile], bpp: int = 8) -> "TileBuffer":
+    """Copies a list of tiles into a new TileBuffer
+    :param tiles: list of Tile objects
+    :param bpp: storage depth of the buffer (4 or 8)
+    :return: TileBuffer
+    """
+    data = b"".join(tile.get_data() for tile in tiles)
+    return TileBuffer(c_ext._8bpp_to_4bpp(data) if bpp == 4 else data, bpp)
+
+  def get_data(self, bpp: int = 8) -> bytes:
+    """Get the data of every tile, converting it if the requested depth differs from the storage depth.
+    :param bpp: 8 for one byte per pixel, 4 for packed NCGR tile data
+    :return: bytes-like object
+    """
+    if bpp == self.bpp:
+      return self.data
+    if bpp == 4:
+      return c_ext._8bpp_to_4bpp(self.data)
+    return c_ext._4bpp_to_8bpp(self.data)
+
+  def __index(self, index: int) -> int:
+    count = len(self)
+    if index < 0:
+      index += count
+    if index < 0 or index >= count:
+      raise IndexError("tile index out of range")
+    return index
+
+  def __encode(self, tile: Tile) -> bytes:
+    data = tile.get_data()
+    return c_ext._8bpp_to_4bpp(data) if self.bpp == 4 else data
+
+  def __encode_all(self, tiles) -> bytes:
+    data = b"".join(tile.get_data() for tile in tiles)
+    return c_ext._8bpp_to_4bpp(data) if self.bpp == 4 else data
+
+  def __len__(self) -> int:
+    return len(self.data) // self.tile_size
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      return [TileView(self, i) for i in range(*index.indices(len(self)))]
+    return TileView(self, self.__index(index))
+
+  def __setitem__(self, index, tile):
+    if isinstance(index, slice):
+      tiles = list(tile)
+      start, stop, step = index.indices(len(self))
+      if step == 1:
+        self.data[start * self.tile_size : max(start, stop) * self.tile_size] = self.__encode_all(tiles)
+        return
+      indices = range(start, stop, step)
+      if len(indices) != len(tiles):
+        raise ValueError(f"attempt to assign sequence of size {len(tiles)} to extended slice of size {len(indices)}")
+      for i, t in zip(indices, tiles):
+        self[i] = t
+      return
+    offset = self.__index(index) * self.tile_size
+    self.data[offset : offset + self.tile_size] = self.__encode(tile)
+
+  def __delitem__(self, index):
+    if isinstance(index, slice):
+      start, stop, step = index.indices(len(self))
+      if step == 1:
+        del self.data[start * self.tile_size : max(start, stop) * self.tile_size]
+        return
+      for i in sorted(range(start, stop, step), reverse=True):
+        del self[i]
+      return
+    offset = self.__index(index) * self.tile_size
+    del self.data[offset : offset + self.tile_size]
+
+  def insert(self, index: int, tile: Tile):
+    offset = min(max(index + len(self) if index < 0 else index, 0), len(self)) * self.tile_size
+    self.data[offset:offset] = self.__encode(tile)
+
+  def __iter__(self):
+    return (TileView(self, i) for i in range(len(self)))
+
+  def append(self, tile: Tile):
+    self.data += self.__encode(tile)
+
+  def extend(self, tiles):
+    self.data += self.__encode_all(tiles)
+
+  def pop(self, index: int = -1) -> Tile:
+    tile = Tile(self[index].pixels)
+    del self[index]
+    return tile
+
+  def clear(self):
+    del self.data[:]
+
+  def reverse(self):
+    self[:] = [Tile(tile.pixels) for tile in reversed(self)]
+
+  def __add__(self, tiles) -> "TileBuffer":
+    result = TileBuffer(self.data, self.bpp)
+    result.extend(tiles)
+    return result
+
+  def __eq__(self, other) -> bool:
+    if isinstance(other, TileBuffer):
+      return self.get_data(8) == other.get_data(8)
+    if not isinstance(other, list):
+      return NotImplemented
+    return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+  def __repr__(self) -> str:
+    return f"<{self.bpp}bpp TileBuffer with {len(self)} tiles>"
+
+
 class NCGR:
   "Class for representing NCGR and NCBR tilesets"
 
-  def __init__(self, bpp: int = 4):
+  def __init__(self, bpp: int = 4, contiguous: bool = False, packed: bool = False):
+    """:param bpp: bits per pixel (4 or 8)
+    :param contiguous: store tiles in a single TileBuffer instead of a list of Tile objects
+    :param packed: like contiguous, but 4bpp tiles are kept packed instead of expanded to 8bpp
+    """
     self.bpp = bpp  # bits per pixel (4 or 8)
-    self.tiles = []  # each tile is a list of 64 ints
+    self.tiles: list[Tile] | TileBuffer = []  # Tile objects, 64 8bpp pixels each
+    if contiguous or packed:
+      self.tiles = TileBuffer(bpp=bpp if packed else 8)
     self.width = 0  # in tiles
     self.height = 0  # in tiles
     self.ncbr = False  # is file encoded as NCBR
@@ -49,12 +216,6 @@ class NCGR:
     self.height = len(self.tiles) // self.width
     return self.width * self.height == len(self.tiles)
 
-  def __pack_tile(self, tile: Tile) -> bytes:
-    tile_data = tile.get_data()
-    if self.bpp == 4:
-      return c_ext._8bpp_to_4bpp(tile_data)
-    return tile_data
-
   def pack(self) -> bytes:
     """Pack NCGR into bytes
     :return: bytes"""
@@ -67,39 +228,44 @@ class NCGR:
     bitdepth = 4 if self.bpp == 8 else 3
 
     header = util.pack_nitro_header("RGCN", sect_size + (0x10 if has_sopc else 0), (2 if has_sopc else 1), 1)
-    header2 = b"RAHC" + struct.pack(
+    header += b"RAHC" + struct.pack(
       "<IHHIIIII", sect_size, self.height, self.width, bitdepth, 0, self.ncbr, tiledat_size, self.unk
     )
 
     if self.ncbr:
-      tiledata = self.__pack_ncbr()
-    else:
-      tiledata = b""
-      for tile in self.tiles:
-        tiledata += self.__pack_tile(tile)
-    if not has_sopc:
-      return header + header2 + tiledata
-    sopc = "SOPC".encode("ascii") + bytes([0x10, 0, 0, 0, 0, 0, 0, 0, 0x20, 0]) + struct.pack("<H", self.height)
-    return header + header2 + tiledata + sopc
+      return header + self.__pack_ncbr()
+    sopc = b"SOPC" + struct.pack("<IIHH", 0x10, 0, 0x20, self.height)
+    if isinstance(self.tiles, TileBuffer):
+      return c_ext.pack_tiles(header, self.tiles.data, self.bpp, sopc, self.tiles.bpp)
+    return c_ext.pack_tiles(header, [tile.get_data() for tile in self.tiles], self.bpp, sopc)
 
   def __pack_ncbr(self) -> bytes:
-    tile_pixels = list(map(lambda t: t.get_data(), self.tiles))
-    data = c_ext.pack_ncbr_tiles(tile_pixels, self.width, self.height)
-    if self.bpp == 4:
-      return c_ext._8bpp_to_4bpp(data)
-    return data
+    if isinstance(self.tiles, TileBuffer):
+      return c_ext.pack_ncbr(self.tiles.data, self.bpp, self.width, self.height, self.tiles.bpp)
+    return c_ext.pack_ncbr([tile.get_data() for tile in self.tiles], self.bpp, self.width, self.height)
 
-  def __unpack_tile(self, data: bytes, tilenum: int) -> Tile:
+  def __unpack_tiles(self, data: bytes, tile_cnt: int) -> list[Tile]:
     if self.ncbr:
-      return Tile(c_ext.read_ncbr_tile(data, tilenum, self.bpp, self.width))
+      data = c_ext.unpack_ncbr(data, self.bpp, self.width, self.height)
+      return [Tile(pixels) for pixels in c_ext.unpack_tiles(data, 8, tile_cnt)]
+    return [Tile(pixels) for pixels in c_ext.unpack_tiles(data, self.bpp, tile_cnt)]
+
+  def __unpack_tile_buffer(self, data: bytes, tile_cnt: int, packed: bool) -> TileBuffer:
+    if self.ncbr:
+      tile_bpp = 4 if packed and self.bpp == 4 else 8
+      return TileBuffer(c_ext.unpack_ncbr(data, self.bpp, self.width, self.height, tile_bpp), tile_bpp)
     if self.bpp == 8:
-      return Tile(data[tilenum * 0x40 : tilenum * 0x40 + 0x40])
-    return Tile(c_ext._4bpp_to_8bpp(data[tilenum * 0x20 : tilenum * 0x20 + 0x20]))
+      return TileBuffer(data[: tile_cnt * 0x40])
+    if packed:
+      return TileBuffer(data[: tile_cnt * 0x20], 4)
+    return TileBuffer(c_ext._4bpp_to_8bpp(data[: tile_cnt * 0x20]))
 
   @staticmethod
-  def unpack(data) -> "NCGR":
+  def unpack(data, contiguous: bool = False, packed: bool = False) -> "NCGR":
     """Unpack NCGR from bytes
     :param data: bytes
+    :param contiguous: store the tiles in a TileBuffer instead of a list of Tile objects
+    :param packed: like contiguous, but 4bpp tiles are kept in their packed form until their pixels are read
     :return: NCGR object
     """
     self = NCGR()
@@ -114,8 +280,13 @@ class NCGR:
       self.height = tiledatsize // (0x40 if self.bpp == 8 else 0x20)
       tile_cnt = self.height * self.width
 
-    for i in range(tile_cnt):
-      self.tiles.append(self.__unpack_tile(data[0x30:], i))
+    tiledata = memoryview(data)[0x30:]
+    if len(tiledata) < tile_cnt * (0x40 if self.bpp == 8 else 0x20):
+      raise ValueError("Tile data is too short.")
+    if contiguous or packed:
+      self.tiles = self.__unpack_tile_buffer(tiledata, tile_cnt, packed)
+    else:
+      self.tiles = self.__unpack_tiles(tiledata, tile_cnt)
     return self
 
   def save_as(self, filepath: str):
@@ -125,13 +296,19 @@ class NCGR:
       f.write(self.pack())
 
   @staticmethod
-  def load_from(filename: str) -> "NCGR":
+  def load_from(filename: str, contiguous: bool = False, packed: bool = False, mmap: bool = False) -> "NCGR":
     """Read NCGR data from a file
     :param filename: path to NCGR file
+    :param contiguous: store the tiles in a TileBuffer instead of a list of Tile objects
+    :param packed: like contiguous, but 4bpp tiles are kept in their packed form until their pixels are read
+    :param mmap: memory-map the file instead of reading it into memory
     :return: NCGR object
     """
+    if mmap:
+      with util.map_file(filename) as data:
+        return NCGR.unpack(data, contiguous, packed)
     with open(filename, "rb") as f:
-      return NCGR.unpack(f.read())
+      return NCGR.unpack(f.read(), contiguous, packed)
 
   def __eq__(self, other) -> bool:
     return self.bpp == other.bpp and self.tiles == other.tiles
@@ -22,11 +22,7 @@ class NCLR:
 
     header = util.pack_nitro_header("RPCN" if self.ncpr else "RLCN", extSize, 1)
     header2 = struct.pack("<IIIIII", 0x504C5454, extSize, bpp, 0, size, 0x10)
-
-    colors = [struct.pack("<H", util.color_to_rgb555(c)) for c in self.colors]
-    for c in colors:
-      header2 += c
-    return header + header2
+    return header + header2 + util.pack_colors(self.colors)
 
   @staticmethod
   def unpack(data: bytes) -> "NCLR":
@@ -42,9 +38,10 @@ class NCLR:
       size = extsz - 0x18
     nclr.is8bpp = bpp == 4
     nclr.ncpr = data[0:4] == b"RPCN"
-    for i in range(size // 2):
-      raw = struct.unpack("<H", data[i * 2 + 0x28 : i * 2 + 0x2A])[0]
-      nclr.colors.append(util.rgb555_to_color(raw))
+    color_data = data[0x28 : 0x28 + size // 2 * 2]
+    if len(color_data) < size // 2 * 2:
+      raise Exception("Palette data is truncated")
+    nclr.colors = util.unpack_colors(color_data)
     return nclr
 
   def save_as(self, filepath: str):
@@ -55,11 +52,15 @@ class NCLR:
       f.write(self.pack())
 
   @staticmethod
-  def load_from(filename: str) -> "NCLR":
+  def load_from(filename: str, mmap: bool = False) -> "NCLR":
     """Reads NCLR palette from NCLR file.
     :param filename: Path to NCLR file
+    :param mmap: memory-map the file instead of reading it into memory
     :return: NCLR object
     """
+    if mmap:
+      with util.map_file(filename) as data:
+        return NCLR.unpack(data)
     with open(filename, "rb") as f:
       return NCLR.unpack(f.read())
 
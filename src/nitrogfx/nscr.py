@@ -1,4 +1,7 @@
 import struct
+import sys
+from array import array
+from collections.abc import MutableSequence
 
 import nitrogfx.util as util
 
@@ -6,19 +9,25 @@ import nitrogfx.util as util
 class MapEntry:
   "Represents a single entry in a tilemap"
 
+  __slots__ = ("tile", "pal", "yflip", "xflip")
+
   def __init__(self, tile: int = 0, pal: int = 0, xflip: bool = False, yflip: bool = False):
     self.tile = tile
     self.pal = pal
     self.yflip = yflip
     self.xflip = xflip
 
-  def pack(self) -> bytes:
-    ":return: bytes"
+  def to_raw(self) -> int:
+    ":return: 16-bit tilemap entry value"
     x = self.tile & 0x3FF
     x |= (self.xflip & 1) << 10
     x |= (self.yflip & 1) << 11
     x |= (self.pal & 0xF) << 12
-    return struct.pack("<H", x)
+    return x
+
+  def pack(self) -> bytes:
+    ":return: bytes"
+    return struct.pack("<H", self.to_raw())
 
   @staticmethod
   def unpack(data: int) -> "MapEntry":
@@ -29,12 +38,123 @@ class MapEntry:
   def __eq__(self, other) -> bool:
     if not isinstance(other, MapEntry):
       return False
-    return self.pack() == other.pack()
+    return self.to_raw() == other.to_raw()
 
   def __repr__(self) -> str:
     return f"<MapEntry tile={self.tile} pal={self.pal} xflip={self.xflip} yflip={self.yflip}>"
 
 
+class MapEntryView(MapEntry):
+  "MapEntry that reads and writes one raw entry of an NSCR map in place"
+
+  __slots__ = ("__entries", "__index")
+
+  def __init__(self, entries: array, index: int):
+    self.__entries = entries
+    self.__index = index
+
+  def __set_bits(self, value: int, shift: int, mask: int):
+    raw = self.__entries[self.__index] & ~(mask << shift)
+    self.__entries[self.__index] = raw | ((int(value) & mask) << shift)
+
+  def to_raw(self) -> int:
+    return self.__entries[self.__index]
+
+  @property
+  def tile(self) -> int:
+    return self.__entries[self.__index] & 0x3FF
+
+  @tile.setter
+  def tile(self, value: int):
+    self.__set_bits(value, 0, 0x3FF)
+
+  @property
+  def xflip(self) -> bool:
+    return bool((self.__entries[self.__index] >> 10) & 1)
+
+  @xflip.setter
+  def xflip(self, value: bool):
+    self.__set_bits(value, 10, 1)
+
+  @property
+  def yflip(self) -> bool:
+    return bool((self.__entries[self.__index] >> 11) & 1)
+
+  @yflip.setter
+  def yflip(self, value: bool):
+    self.__set_bits(value, 11, 1)
+
+  @property
+  def pal(self) -> int:
+    return (self.__entries[self.__index] >> 12) & 0xF
+
+  @pal.setter
+  def pal(self, value: int):
+    self.__set_bits(value, 12, 0xF)
+
+
+class MapEntryList(MutableSequence):
+  """List-like wrapper around the raw entries of an NSCR map, handing out MapEntryView objects.
+  Changes to the list edit the map's entries in place."""
+
+  def __init__(self, entries: array):
+    self.entries = entries
+
+  def __len__(self) -> int:
+    return len(self.entries)
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      return [MapEntryView(self.entries, i) for i in range(*index.indices(len(self)))]
+    if index < 0:
+      index += len(self.entries)
+    if index < 0 or index >= len(self.entries):
+      raise IndexError("map index out of range")
+    return MapEntryView(self.entries, index)
+
+  def __setitem__(self, index, entry):
+    if isinstance(index, slice):
+      self.entries[index] = array("H", [e.to_raw() for e in entry])
+    else:
+      self.entries[index] = entry.to_raw()
+
+  def __delitem__(self, index):
+    del self.entries[index]
+
+  def insert(self, index: int, entry: MapEntry):
+    self.entries.insert(index, entry.to_raw())
+
+  def append(self, entry: MapEntry):
+    self.entries.append(entry.to_raw())
+
+  def extend(self, entries):
+    self.entries.extend([entry.to_raw() for entry in entries])
+
+  def pop(self, index: int = -1) -> MapEntry:
+    return MapEntry.unpack(self.entries.pop(index))
+
+  def clear(self):
+    del self.entries[:]
+
+  def reverse(self):
+    self.entries.reverse()
+
+  def __iter__(self):
+    return (MapEntryView(self.entries, i) for i in range(len(self.entries)))
+
+  def __add__(self, entries) -> "MapEntryList":
+    result = MapEntryList(array("H", self.entries))
+    result.extend(entries)
+    return result
+
+  def __eq__(self, other) -> bool:
+    if isinstance(other, MapEntryList):
+      return self.entries == other.entries
+    if not isinstance(other, list):
+      return NotImplemented
+    return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+
 class NSCR:
   "Class for representing an NSCR tilemap file"
 
@@ -43,7 +163,19 @@ class NSCR:
     self.width = w
     self.height = h
     self.color_mode = color_mode
-    self.map: list[MapEntry] = [MapEntry() for i in range(w * h // 64)]
+    self.entries = array("H", bytes(w * h // 64 * 2))  # raw 16-bit map entries
+
+  @property
+  def map(self) -> MapEntryList:
+    ":return: list-like view of the tilemap's MapEntry objects"
+    return MapEntryList(self.entries)
+
+  @map.setter
+  def map(self, entries: list[MapEntry]):
+    if isinstance(entries, MapEntryList):
+      self.entries = array("H", entries.entries)
+    else:
+      self.entries = array("H", [entry.to_raw() for entry in entries])
 
   @property
   def is8bpp(self) -> bool:
@@ -55,15 +187,15 @@ class NSCR:
     :param y: y coordinate in tile grid
     :param entry: MapEntry object
     """
-    self.map[y * self.width // 8 + x] = entry
+    self.entries[y * self.width // 8 + x] = entry.to_raw()
 
   def get_entry(self, x: int, y: int) -> MapEntry:
     """Get tilemap entry at position. Note that x & y are tile coordinates, not pixel coordinates.
     :param x: x coordinate in tile grid
     :param y: y coordinate in tile grid
-    :return: MapEntry object
+    :return: MapEntry view that edits the tilemap in place
     """
-    return self.map[y * self.width // 8 + x]
+    return MapEntryView(self.entries, y * self.width // 8 + x)
 
   def pack(self) -> bytes:
     """Pack NSCR to bytes.
@@ -73,9 +205,11 @@ class NSCR:
     size = map_size + 0x14
     header = util.pack_nitro_header("RCSN", size, 1)
     data = "NRCS".encode("ascii") + struct.pack("<IHHII", size, self.width, self.height, self.color_mode, map_size)
-    for m in self.map:
-      data += m.pack()
-    return header + data
+    entries = self.entries
+    if sys.byteorder == "big":
+      entries = array("H", entries)
+      entries.byteswap()
+    return header + data + entries.tobytes()
 
   @staticmethod
   def unpack(data: bytes) -> "NSCR":
@@ -86,11 +220,10 @@ class NSCR:
     size, w, h, color_mode, map_size = struct.unpack("<IHHII", data[0x14:0x24])
 
     nscr = NSCR(w, h, color_mode)
-    map_ = []
-    for i in range(0, map_size, 2):
-      raw = data[0x24 + i] | (data[0x25 + i] << 8)
-      map_.append(MapEntry.unpack(raw))
-    nscr.map = map_
+    nscr.entries = array("H")
+    nscr.entries.frombytes(data[0x24 : 0x24 + map_size // 2 * 2])
+    if sys.byteorder == "big":
+      nscr.entries.byteswap()
     return nscr
 
   def save_as(self, filename: str):
@@ -101,13 +234,17 @@ class NSCR:
       f.write(self.pack())
 
   @staticmethod
-  def load_from(filename: str) -> "NSCR":
+  def load_from(filename: str, mmap: bool = False) -> "NSCR":
     """Load NSCR file.
     :param filename: Path to NSCR file
+    :param mmap: memory-map the file instead of reading it into memory
     :return: NSCR object
     """
+    if mmap:
+      with util.map_file(filename) as data:
+        return NSCR.unpack(data)
     with open(filename, "rb") as f:
       return NSCR.unpack(f.read())
 
   def __eq__(self, other) -> bool:
-    return self.width == other.width and self.height == other.height and self.map == other.map
+    return self.width == other.width and self.height == other.height and self.entries == other.entries
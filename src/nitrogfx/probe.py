@@ -0,0 +1,88 @@
+import os
+import struct
+
+FORMATS = {
+  b"RGCN": "NCGR",
+  b"RCSN": "NSCR",
+  b"RLCN": "NCLR",
+  b"RPCN": "NCPR",
+  b"RECN": "NCER",
+  b"RNAN": "NANR",
+}
+"Nitro file magic numbers and the names of their formats"
+
+PROBE_SIZE = 0x30
+"Number of bytes probe reads, enough for the file header and the first section header of every format"
+
+
+class NitroInfo:
+  """Summary of a Nitro file read from its headers by probe.
+  Fields that don't apply to the file's format are None."""
+
+  def __init__(self):
+    self.format: str | None = None  # format name, e.g. "NCGR", or None if the magic isn't known
+    self.magic = b""  # magic number as stored in the file, e.g. b"RGCN"
+    self.file_size = 0  # file size from the header
+    self.section_count = 0
+    self.section_magic = b""  # magic number of the first section
+    self.section_size = 0  # size of the first section
+    self.width: int | None = None  # NCGR/NSCR width in pixels
+    self.height: int | None = None  # NCGR/NSCR height in pixels
+    self.bpp: int | None = None  # NCGR/NSCR/NCLR bits per pixel (4 or 8)
+    self.count: int | None = None  # number of NCGR tiles, NSCR map entries, NCLR colors, NCER cells or NANR anims
+    self.frames: int | None = None  # total number of NANR frames
+    self.ncbr: bool | None = None  # is the NCGR encoded as NCBR
+    self.extended: bool | None = None  # does the NCER use extended cells
+    self.mapping_type: int | None = None  # NCGR/NCER character mapping type
+
+  def __repr__(self) -> str:
+    fields = ", ".join(f"{k}={v!r}" for k, v in vars(self).items() if v is not None)
+    return f"<NitroInfo {fields}>"
+
+
+def probe(file) -> NitroInfo:
+  """Identifies a Nitro file from its file header and first section header, without decoding the rest of it.
+  :param file: path to a file, or bytes-like object holding at least the start of a file
+  :return: NitroInfo object
+  """
+  if isinstance(file, (str, os.PathLike)):
+    with open(file, "rb") as f:
+      data = f.read(PROBE_SIZE)
+  else:
+    data = bytes(memoryview(file)[:PROBE_SIZE])
+  if len(data) < 0x18 or data[4:6] != b"\xff\xfe":
+    raise ValueError("Data doesn't start with a Nitro file header")
+
+  info = NitroInfo()
+  info.magic = data[0:4]
+  info.format = FORMATS.get(info.magic)
+  info.file_size, header_size, info.section_count = struct.unpack_from("<IHH", data, 8)
+  info.section_magic = data[0x10:0x14]
+  (info.section_size,) = struct.unpack_from("<I", data, 0x14)
+  if len(data) < PROBE_SIZE or header_size != 0x10:
+    return info
+
+  if info.format == "NCGR":
+    height, width, bitdepth, info.mapping_type, mode, tiledat_size = struct.unpack_from("<HHIIII", data, 0x18)
+    info.bpp = 4 if bitdepth == 3 else 8
+    info.ncbr = mode == 1
+    info.count = tiledat_size // (0x40 if info.bpp == 8 else 0x20)
+    if width * height == info.count:  # sizes of tilesets that aren't rectangular are stored as 0xFFFF
+      info.width = width * 8
+      info.height = height * 8
+  elif info.format == "NSCR":
+    info.width, info.height, color_mode, map_size = struct.unpack_from("<HHII", data, 0x18)
+    info.bpp = 8 if color_mode else 4
+    info.count = map_size // 2
+  elif info.format in ("NCLR", "NCPR"):
+    bitdepth, size = struct.unpack_from("<H6xI", data, 0x18)
+    if size == 0 or size > info.section_size:
+      size = info.section_size - 0x18
+    info.bpp = 8 if bitdepth == 4 else 4
+    info.count = size // 2
+  elif info.format == "NCER":
+    info.count, extended, info.mapping_type = struct.unpack_from("<HH4xI", data, 0x18)
+    info.extended = extended == 1
+  elif info.format == "NANR":
+    info.count, info.frames = struct.unpack_from("<HH", data, 0x18)
+  return info
@@ -1,12 +1,18 @@
+import itertools
+import mmap
 import struct
+import sys
+from array import array
+from contextlib import contextmanager
+from functools import cache
 
 from PIL import Image
 
 import nitrogfx
 import nitrogfx.c_ext.tile as c_ext
-from nitrogfx.ncgr import NCGR, Tile
+from nitrogfx.ncgr import NCGR, Tile, TileBuffer
 from nitrogfx.nclr import NCLR
-from nitrogfx.nscr import MapEntry
+from nitrogfx.nscr import NSCR, MapEntry
 
 try:
   # orjson is an optional dependency which significantly improves json performance
@@ -53,6 +59,82 @@ def rgb555_to_color(c: int) -> tuple[int, int, int]:
   return (8 * r, 8 * g, 8 * b)
 
 
+@contextmanager
+def map_file(filename: str):
+  """Memory-maps a file for reading, so its contents can be parsed without copying them.
+  Views derived from the yielded memoryview must not outlive the with-block.
+  :param filename: path to file
+  :return: context manager yielding a read-only memoryview of the file
+  """
+  with open(filename, "rb") as f:
+    try:
+      mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:  # empty files can't be mapped
+      yield memoryview(b"")
+      return
+    view = memoryview(mapped)
+    try:
+      yield view
+    finally:
+      view.release()
+      try:
+        mapped.close()
+      except BufferError:
+        pass  # a slice is still referenced (e.g. by a traceback), the map is closed when it's collected
+
+
+def find_section(data, magic: bytes, start: int = 0) -> int:
+  """Finds a section magic number in bytes or a memoryview.
+  :param data: bytes-like object
+  :param magic: bytes to search for
+  :param start: offset from which to start searching
+  :return: offset of magic in data, or -1 if it isn't found
+  """
+  if isinstance(data, memoryview):
+    pos = bytes(data[start:]).find(magic)
+    return pos if pos == -1 else pos + start
+  return data.find(magic, start)
+
+
+@cache
+def _rgb555_table() -> list[tuple[int, int, int]]:
+  "(r,g,b) tuples for every 16-bit value, bit 15 is ignored like in rgb555_to_color"
+  table = [rgb555_to_color(c) for c in range(0x8000)]
+  return table + table
+
+
+def unpack_colors(data) -> list[tuple[int, int, int]]:
+  """Converts packed little-endian 15-bit colors to (r,g,b) tuples in one pass using a lookup table.
+  :param data: bytes-like object, 2 bytes per color
+  :return: list of (r,g,b) tuples
+  """
+  raw = array("H")
+  raw.frombytes(data)
+  if sys.byteorder == "big":
+    raw.byteswap()
+  return list(map(_rgb555_table().__getitem__, raw))
+
+
+def pack_colors(colors: list[tuple[int, int, int]]) -> bytes:
+  """Converts (r,g,b) tuples to packed little-endian 15-bit colors. Inverse of unpack_colors.
+  :param colors: list of (r,g,b) int tuples
+  :return: bytes, 2 bytes per color
+  """
+  raw = array("H", [(c[0] >> 3) | (c[1] >> 3) << 5 | (c[2] >> 3) << 10 for c in colors])
+  if sys.byteorder == "big":
+    raw.byteswap()
+  return raw.tobytes()
+
+
+def slots_equal(a, b) -> bool:
+  """Compares two objects field by field
+  :param a: object of a class with __slots__
+  :param b: object to compare against
+  :return: are a and b of the same class with equal fields
+  """
+  return type(a) is type(b) and all(getattr(a, name) == getattr(b, name) for name in a.__slots__)
+
+
 def pack_nitro_header(magic: str, size: int, section_count: int, unk: int = 0) -> bytes:
   """Creates the standard 16-byte header used in all Nitro formats.
   :return: bytes
@@ -67,7 +149,7 @@ def unpack_labels(data: bytes) -> list[str]:
   """
   assert data[0:4] == b"LBAL", "Label section must start with LBAL"
   labl_size = struct.unpack("<I", data[4:8])[0]
-  labl_data = data[0:labl_size].split(b"\00")
+  labl_data = bytes(data[0:labl_size]).split(b"\00")
 
   label_data_found = 8
   labels = []
@@ -116,12 +198,34 @@ def get_tile_data(pixels, x: int, y: int) -> Tile:
   return Tile(data)
 
 
+def get_image_tiles(img: Image.Image) -> bytes:
+  """Cuts a whole indexed Pillow Image into 8x8 tiles in a single pass.
+  :param img: Indexed Pillow Image with dimensions divisible by 8
+  :return: 8bpp tile data, 64 bytes per tile, with tiles ordered row by row
+  """
+  if img.mode not in ("P", "L"):
+    raise ValueError("Image is not indexed")
+  if img.width % 8 != 0 or img.height % 8 != 0:
+    raise ValueError("Image dimensions must be divisible by 8")
+  return c_ext.unpack_ncbr(img.tobytes(), 8, img.width // 8, img.height // 8)
+
+
 class TilesetBuilder:
-  "Class for building NCGR tilesets without repeating tiles. **Currently only works with 8bpp tiles**."
+  """Class for building NCGR tilesets without repeating tiles. **Currently only works with 8bpp tiles**.
+  A builder can be shared by several images and saved, so later builds find the same tiles again.
+  It holds at most MAX_TILES tiles, the most a tilemap entry can refer to."""
 
-  def __init__(self):
+  MAX_TILES = 0x400
+  "Number of tiles a 10-bit tilemap entry index can refer to"
+
+  def __init__(self, use_flipping: bool = True):
+    """:param use_flipping: reuse flipped copies of tiles. If False, only exact copies are reused,
+    which is several times faster."""
+    self.use_flipping = use_flipping
     self.__tiles: list[Tile] = []  # list of added tiles
-    self.__indices: dict[TileHash, int] = {}  # indices of tiles accessed by TileHash
+    self.__indices: dict[bytes, int] = {}  # indices of tiles accessed by their flip-invariant key, in index order
+    self.__flips = bytearray()  # how each added tile is flipped relative to its key
+    self.__used: set[int] = set()  # raw map entries handed out since the builder was created or loaded
 
   def add(self, tile: Tile):
     """Adds a tile to tileset if it isn't already there
@@ -135,15 +239,58 @@ class TilesetBuilder:
     :param tile: Tile object
     :return: MapEntry
     """
-    hashed = TileHash(tile)
-    if hashed not in self.__indices.keys():
+    if self.use_flipping:
+      key, flip = c_ext.tile_flip_key(tile.get_data())
+    else:
+      key, flip = bytes(tile.get_data()), 0
+    idx = self.__indices.get(key)
+    if idx is None:
+      if len(self.__tiles) >= self.MAX_TILES:
+        raise ValueError(f"Tileset is full, tilemap entries can't refer to more than {self.MAX_TILES} tiles")
       idx = len(self.__tiles)
-      self.__indices[hashed] = idx
+      self.__indices[key] = idx
       self.__tiles.append(tile)
+      self.__flips.append(flip)
+    # tile = flip(key) and stored = stored_flip(key), so tile = (flip ^ stored_flip)(stored)
+    flip ^= self.__flips[idx]
+    self.__used.add(idx | (flip << 10))
+    return MapEntry(idx, 0, bool(flip & 1), bool(flip & 2))
+
+  def get_map_entries(self, data: bytes) -> array:
+    """Get raw map entries for a sequence of tiles, adding the tiles to the tileset if they aren't already.
+    If the tiles don't fit in the tileset, none of them are added.
+    :param data: 8bpp tile data, 64 bytes per tile
+    :return: array('H') of raw map entries
+    """
+    data = bytes(data)
+    indices, tiles, flips = self.__indices, self.__tiles, self.__flips
+    tile_cnt = len(tiles)
+    if self.use_flipping:
+      entries = array("H", bytes(len(data) // 32))
+      for n, (key, flip) in enumerate(c_ext.tile_flip_keys(data)):
+        idx = indices.get(key)
+        if idx is None:
+          idx = indices[key] = len(tiles)
+          tiles.append(Tile(data[n * 64 : n * 64 + 64]))
+          flips.append(flip)
+        entries[n] = (idx & 0x3FF) | ((flip ^ flips[idx]) << 10)
     else:
-      hashed = TileHash(self.__tiles[self.__indices[hashed]])
-    (hflip, vflip) = hashed.get_flipping(tile)
-    return MapEntry(self.__indices[hashed], 0, hflip, vflip)
+      # without flipping the tiles are their own keys and entries are plain indices, so only new tiles need a loop
+      keys = c_ext.unpack_tiles(data, 8, len(data) // 64)
+      new = [key for key in dict.fromkeys(keys) if key not in indices]
+      indices.update(zip(new, range(len(tiles), len(tiles) + len(new))))
+      tiles.extend(map(Tile, new))
+      flips.extend(bytes(len(new)))
+      if len(tiles) <= self.MAX_TILES:
+        entries = array("H", map(indices.__getitem__, keys))
+    if len(tiles) > self.MAX_TILES:
+      for key in list(itertools.islice(indices, tile_cnt, None)):
+        del indices[key]
+      del tiles[tile_cnt:]
+      del flips[tile_cnt:]
+      raise ValueError(f"Tileset is full, tilemap entries can't refer to more than {self.MAX_TILES} tiles")
+    self.__used.update(entries)
+    return entries
 
   def get_tiles(self) -> list[Tile]:
     ":return: list of Tile objects"
@@ -153,45 +300,197 @@ class TilesetBuilder:
     """Produces an NCGR out of the added tiles
     :returns: NCGR"""
     ncgr = NCGR(bpp)
-    ncgr.tiles = self.__tiles
+    ncgr.tiles = list(self.__tiles)
     ncgr.width = 1
     ncgr.height = len(ncgr.tiles)
     return ncgr
 
+  def pack(self, prune: bool = True) -> bytes:
+    """Pack the tileset index into bytes, so it can be reused by later builds.
+    :param prune: leave out tiles that no map entry has referred to since the builder was created or loaded,
+      so tiles of edited or removed images don't stay in the tileset. Every image sharing the tileset has to be
+      converted before saving, and their tilemaps converted again with the loaded index, as tile indices change.
+    :return: bytes"""
+    kept = range(len(self.__tiles))
+    if prune:
+      kept = sorted({entry & 0x3FF for entry in self.__used})
+    header = b"TSBI" + struct.pack("<III", 2, self.use_flipping, len(kept))
+    tiles = b"".join(self.__tiles[i].get_data() for i in kept)
+    return header + tiles + bytes(self.__flips[i] for i in kept)
+
+  @staticmethod
+  def unpack(data: bytes) -> "TilesetBuilder":
+    """Unpack a tileset index from bytes
+    :param data: bytes
+    :return: TilesetBuilder
+    """
+    if data[:4] != b"TSBI":
+      raise Exception("Not a tileset index")
+    version, use_flipping, tile_cnt = struct.unpack_from("<III", data, 4)
+    if version not in (1, 2):
+      raise Exception(f"Unsupported tileset index version {version}")
+    self = TilesetBuilder(bool(use_flipping))
+    offset = 0x14 if version == 1 else 0x10  # version 1 also stored whole images' map entries, which are ignored
+    self.__flips = bytearray(data[offset + tile_cnt * 64 : offset + tile_cnt * 65])
+    for i in range(tile_cnt):
+      tile = Tile(bytes(data[offset : offset + 64]))
+      key = c_ext.tile_flip_key(tile.pixels)[0] if self.use_flipping else tile.pixels
+      self.__indices[key] = i
+      self.__tiles.append(tile)
+      offset += 64
+    return self
+
+  def save_as(self, filepath: str, prune: bool = True):
+    """Save the tileset index as file
+    :param filepath: path to file
+    :param prune: leave out tiles not used since the builder was created or loaded, see pack"""
+    with open(filepath, "wb") as f:
+      f.write(self.pack(prune))
+
+  @staticmethod
+  def load_from(filename: str) -> "TilesetBuilder":
+    """Read a tileset index from a file
+    :param filename: path to file
+    :return: TilesetBuilder
+    """
+    with open(filename, "rb") as f:
+      return TilesetBuilder.unpack(f.read())
+
 
 class TileHash:
   """Hashable wrapper for Tile objects.
-  The hashes are equal for tiles that are flipped copies of each other.
+  Tiles that are flipped copies of each other hash and compare equal.
 
-  Used by TilesetBuilder to quickly find if a tile is already in the tileset,
+  Can be used to quickly find if a tile is already in a set of tiles,
   and how the hashed tile needs to be flipped to produce the other tile.
   """
 
   def __init__(self, tile: Tile):
-    self.__unflipped = tile.get_data()
-    self.__hflipped = tile.flipped(True, False).get_data()
-    self.__vflipped = tile.flipped(False, True).get_data()
-    self.__hvflipped = tile.flipped(True, True).get_data()
-    self.__hash = hash(self.__unflipped) * hash(self.__hflipped) * hash(self.__vflipped) * hash(self.__hvflipped)
+    self.__key, self.__flip = c_ext.tile_flip_key(tile.get_data())
 
   def get_flipping(self, tile) -> tuple[bool, bool]:
     ":return: (hflip, vflip) boolean tuple"
-    pixels = tile.get_data()
-    if pixels == self.__unflipped:
-      return (False, False)
-    if pixels == self.__hflipped:
-      return (True, False)
-    if pixels == self.__vflipped:
-      return (False, True)
-    if pixels == self.__hvflipped:
-      return (True, True)
-    raise Exception("TileHash: Tile not found in hash")
+    key, flip = c_ext.tile_flip_key(tile.get_data())
+    if key != self.__key:
+      raise Exception("TileHash: Tile not found in hash")
+    flip ^= self.__flip
+    return (bool(flip & 1), bool(flip & 2))
 
   def __hash__(self) -> int:
-    return self.__hash
+    return hash(self.__key)
 
   def __eq__(self, other) -> bool:
-    return self.__hash == other.__hash
+    return self.__key == other.__key
+
+
+def get_ncgr_tile_data(ncgr: NCGR) -> tuple[bytes, int]:
+  """Get the data of every tile in an NCGR as one bytes-like object, without copying TileBuffer storage.
+  :param ncgr: NCGR tileset
+  :return: tuple of (tile data, bpp of the tile data)
+  """
+  if isinstance(ncgr.tiles, TileBuffer):
+    return (ncgr.tiles.data, ncgr.tiles.bpp)
+  return (b"".join(tile.get_data() for tile in ncgr.tiles), 8)
+
+
+def nclr_to_rgba(nclr: NCLR) -> bytes:
+  """Converts NCLR colors to RGBA bytes, 4 bytes per color
+  :param nclr: NCLR palette
+  :return: bytes
+  """
+  return bytes(v for c in nclr.colors for v in (c[0], c[1], c[2], 0xFF))
+
+
+def tilemap_to_img(ncgr: NCGR, nscr: NSCR, nclr: NCLR, mode: str = "RGBA") -> Image.Image:
+  """Renders a tilemap straight to an RGB or RGBA Pillow Image.
+  Entries of 4bpp tilemaps use their own 16-color palette bank. In RGBA images color 0 is transparent.
+  :param ncgr: NCGR tileset
+  :param nscr: NSCR tilemap
+  :param nclr: NCLR palette
+  :param mode: "RGB" or "RGBA"
+  :return: Pillow Image
+  """
+  if mode not in ("RGB", "RGBA"):
+    raise ValueError(f"Unsupported image mode: {mode}")
+  channels = len(mode)
+  canvas = bytearray(nscr.width * nscr.height * channels)
+  tiles, tiles_bpp = get_ncgr_tile_data(ncgr)
+  c_ext.draw_tilemap_rgb(
+    canvas,
+    nscr.width,
+    tiles,
+    tiles_bpp,
+    nscr.entries,
+    nscr.width // 8,
+    nscr.height // 8,
+    nclr_to_rgba(nclr),
+    channels,
+    not nscr.is8bpp,
+  )
+  return Image.frombytes(mode, (nscr.width, nscr.height), bytes(canvas))
+
+
+def oam_position(oam) -> tuple[int, int]:
+  """Position of an OAM relative to its cell, decoding x as a signed 9-bit and y as a signed 8-bit value.
+  :param oam: OAM object
+  :return: (x, y) tuple
+  """
+  x = oam.x - 0x200 if oam.x & 0x100 else oam.x
+  y = oam.y - 0x100 if oam.y & 0x80 else oam.y
+  return (x, y)
+
+
+def oam_bounds(oam) -> tuple[int, int, int, int] | None:
+  """Area covered by an OAM relative to its cell
+  :param oam: OAM object
+  :return: (left, top, right, bottom) tuple, or None if the OAM isn't drawn
+  """
+  if (oam.sizeDisable and not oam.rot) or oam.mode == 2:  # hidden or OBJ window
+    return None
+  w, h = oam.get_size()
+  if oam.rot and oam.sizeDisable:  # double size affine OAM
+    w, h = w * 2, h * 2
+  x, y = oam_position(oam)
+  return (x, y, x + w, y + h)
+
+
+def cells_to_img(cells: list, ncgr: NCGR, nclr: NCLR, mapping_type: int = 0, columns: int = 1) -> Image.Image:
+  """Renders cells to an RGBA Pillow Image in a single pass. Color 0 is transparent.
+  Every cell is drawn in a frame big enough for all of them, with the same origin, frames are laid out in rows.
+  OAMs with a lower priority value are drawn on top, OAMs of equal priority are drawn on top of later ones.
+  Affine OAMs are drawn without their transformation.
+  :param cells: list of Cell objects
+  :param ncgr: NCGR tileset the OAMs' character numbers refer to
+  :param nclr: NCLR palette
+  :param mapping_type: character mapping of the NCER (0-3 for 1D mapping, 4 for 2D mapping)
+  :param columns: number of frames per row
+  :return: Pillow Image
+  """
+  bounds = [b for cell in cells for b in map(oam_bounds, cell.oam) if b is not None]
+  left = min((b[0] for b in bounds), default=0)
+  top = min((b[1] for b in bounds), default=0)
+  frame_w = max((b[2] for b in bounds), default=1) - left
+  frame_h = max((b[3] for b in bounds), default=1) - top
+  columns = max(1, min(columns, len(cells)))
+  width = frame_w * columns
+  height = frame_h * max(1, -(-len(cells) // columns))
+
+  records = bytearray(16 * sum(len(cell.oam) for cell in cells))
+  pos = 0
+  for i, cell in enumerate(cells):
+    x = i % columns * frame_w - left
+    y = i // columns * frame_h - top
+    # draw back to front: highest priority value first, and within a priority the last OAM first
+    for j in sorted(range(len(cell.oam)), key=lambda j: (cell.oam[j].prio, j), reverse=True):
+      oam = cell.oam[j]
+      ox, oy = oam_position(oam)
+      struct.pack_into("=iiHHHH", records, pos, x + ox, y + oy, *oam.to_attrs(), 0)
+      pos += 16
+
+  canvas = bytearray(width * height * 4)
+  tiles, tiles_bpp = get_ncgr_tile_data(ncgr)
+  c_ext.draw_oams(canvas, width, height, tiles, tiles_bpp, ncgr.bpp, records, nclr_to_rgba(nclr), mapping_type)
+  return Image.frombytes("RGBA", (width, height), bytes(canvas))
 
 
 class TileCanvas:
@@ -211,6 +510,23 @@ class TileCanvas:
     tile = ncgr.tiles[map_entry.tile].flipped(map_entry.xflip, map_entry.yflip)
     c_ext.draw_tile_to_buffer(self.data, tile.get_data(), x, y, self.w)
 
+  def draw_tileset(self, ncgr: NCGR):
+    """Draws the first width*height tiles of a tileset in order, row by row, filling the whole canvas.
+    :param ncgr: NCGR tileset with the same dimensions as the canvas
+    """
+    if isinstance(ncgr.tiles, TileBuffer):
+      self.data[:] = c_ext.pack_ncbr(ncgr.tiles.data, 8, self.w // 8, self.h // 8, ncgr.tiles.bpp)
+    else:
+      self.data[:] = c_ext.pack_ncbr([tile.get_data() for tile in ncgr.tiles], 8, self.w // 8, self.h // 8)
+
+  def draw_tilemap(self, ncgr: NCGR, nscr: NSCR):
+    """Draws every entry of a tilemap on the canvas in a single call.
+    :param ncgr: NCGR tileset
+    :param nscr: NSCR tilemap no larger than the canvas
+    """
+    tiles, tiles_bpp = get_ncgr_tile_data(ncgr)
+    c_ext.draw_tilemap(self.data, self.w, tiles, tiles_bpp, nscr.entries, nscr.width // 8, nscr.height // 8)
+
   def as_img(self, nclr: NCLR) -> Image.Image:
     img = Image.frombytes("P", (self.w, self.h), bytes(self.data))
     pal = nitrogfx.convert.nclr_to_imgpal(nclr) # type: ignore
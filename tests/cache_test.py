@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from nitrogfx import cache as cache_module
+from nitrogfx.cache import ConversionCache
+
+
+class CacheTest(unittest.TestCase):
+  def test_key_depends_on_inputs_and_params(self):
+    key = ConversionCache.key("png-to-nscr", [b"abc"], {"bpp": 8})
+    self.assertEqual(key, ConversionCache.key("png-to-nscr", [b"abc"], {"bpp": 8}))
+    self.assertNotEqual(key, ConversionCache.key("png-to-nscr", [b"abd"], {"bpp": 8}))
+    self.assertNotEqual(key, ConversionCache.key("png-to-nscr", [b"abc"], {"bpp": 4}))
+    self.assertNotEqual(key, ConversionCache.key("png-to-ncgr", [b"abc"], {"bpp": 8}))
+    self.assertNotEqual(ConversionCache.key("op", [b"ab", b"c"]), ConversionCache.key("op", [b"a", b"bc"]))
+
+  def test_put_get(self):
+    with tempfile.TemporaryDirectory() as tdir:
+      cache = ConversionCache(tdir + "/cache")
+      self.assertIsNone(cache.get("a"))
+      cache.put("a", [b"first", b"", b"third"])
+      self.assertEqual(cache.get("a"), [b"first", b"", b"third"])
+
+  def test_lru_eviction(self):
+    with tempfile.TemporaryDirectory() as tdir:
+      cache = ConversionCache(tdir, max_bytes=150)  # room for three 42-byte entries, evicts down to 135 bytes
+      for i, key in enumerate("abc"):
+        cache.put(key, [bytes(30)])
+        os.utime(os.path.join(tdir, key + ".bin"), (i, i))
+      cache.get("a")  # a becomes the most recently used entry
+      cache.put("d", [bytes(30)])
+      self.assertIsNone(cache.get("b"))
+      self.assertIsNotNone(cache.get("a"))
+      self.assertIsNotNone(cache.get("c"))
+      self.assertIsNotNone(cache.get("d"))
+
+  def test_evict_down_to_low_water(self):
+    with tempfile.TemporaryDirectory() as tdir:
+      cache = ConversionCache(tdir, max_bytes=90)  # evicts down to 81 bytes
+      for i, key in enumerate("abc"):
+        cache.put(key, [bytes(30)])
+        os.utime(os.path.join(tdir, key + ".bin"), (i, i))
+      self.assertEqual(sorted(os.listdir(tdir)), ["c.bin"])
+
+  def test_put_only_scans_when_over_limit(self):
+    with tempfile.TemporaryDirectory() as tdir:
+      cache = ConversionCache(tdir, max_bytes=1000)
+      with mock.patch.object(cache_module.os, "scandir", wraps=os.scandir) as scandir:
+        for i in range(20):
+          cache.put(str(i), [bytes(30)])
+        self.assertEqual(scandir.call_count, 1)
+        for i in range(20, 30):
+          cache.put(str(i), [bytes(30)])
+        self.assertEqual(scandir.call_count, 4)  # once full, eviction frees room for three entries
+      self.assertLessEqual(len(os.listdir(tdir)) * 42, 900)
+
+  def test_key_depends_on_library_version(self):
+    key = ConversionCache.key("op", [b"abc"])
+    with mock.patch.object(cache_module, "_library_version", return_value="0.0.1"):
+      self.assertNotEqual(key, ConversionCache.key("op", [b"abc"]))
+
+  def test_corrupt_entry_is_a_miss(self):
+    with tempfile.TemporaryDirectory() as tdir:
+      cache = ConversionCache(tdir)
+      cache.put("a", [b"first", b"second"])
+      path = os.path.join(tdir, "a.bin")
+      with open(path, "rb") as f:
+        data = f.read()
+      for corrupt in (b"NGCC\x05\x00", data[:-1], data + b"x", b"XXXX" + data[4:], data[:8]):
+        with open(path, "wb") as f:
+          f.write(corrupt)
+        self.assertIsNone(cache.get("a"))
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,75 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from nitrogfx.cache import ConversionCache
+from nitrogfx.cli import expand_jobs, main, run_job, run_jobs
+from nitrogfx.nanr import NANR
+from nitrogfx.ncer import NCER
+
+MULTI_OAM_NCER = "test_data/multi_oam.NCER"
+NANR_EXAMPLE = "test_data/big_anim.NANR"
+
+
+class CliTest(unittest.TestCase):
+  def test_glob_jobs(self):
+    jobs = expand_jobs("ncer-to-json", ["test_data/*.NCER"], "out")
+    self.assertIn(MULTI_OAM_NCER, [job["input"] for job in jobs])
+    self.assertTrue(all(job["op"] == "ncer-to-json" and job["output_dir"] == "out" for job in jobs))
+
+  def test_run_jobs_in_pool(self):
+    with tempfile.TemporaryDirectory() as tdir:
+      jobs = [
+        {"op": "ncer-to-json", "input": MULTI_OAM_NCER, "output": tdir + "/cells.json"},
+        {"op": "json-to-ncer", "input": tdir + "/missing.json", "output_dir": tdir},
+        {"op": "nanr-to-json", "input": NANR_EXAMPLE, "output_dir": tdir},
+      ]
+      out = io.StringIO()
+      self.assertEqual(run_jobs(jobs, workers=2, out=out), 1)
+      lines = out.getvalue().splitlines()
+      self.assertTrue(lines[0].startswith("[1/3] ncer-to-json") and lines[0].endswith("ok"))
+      self.assertIn("FAILED", lines[1])
+      self.assertEqual(lines[3][:3], "2/3")
+      self.assertTrue(os.path.exists(tdir + "/cells.json"))
+      self.assertTrue(os.path.exists(tdir + "/big_anim.json"))
+
+  def test_manifest(self):
+    with tempfile.TemporaryDirectory() as tdir:
+      with open(tdir + "/jobs.json", "w") as f:
+        json.dump([{"op": "nanr-to-json", "input": NANR_EXAMPLE}, {"op": "ncer-to-json", "input": MULTI_OAM_NCER}], f)
+      with redirect_stdout(io.StringIO()):
+        self.assertEqual(main(["--manifest", tdir + "/jobs.json", "-o", tdir, "-j", "1"]), 0)
+        self.assertEqual(main(["json-to-nanr", tdir + "/big_*.json", "-o", tdir + "/out", "-j", "1"]), 0)
+        self.assertEqual(main(["json-to-ncer", tdir + "/multi_oam.json", "-o", tdir + "/out", "-j", "1"]), 0)
+        self.assertEqual(main(["json-to-ncer", tdir + "/jobs.json", "-j", "1"]), 1)
+      self.assertEqual(NANR.load_from(tdir + "/out/big_anim.NANR"), NANR.load_from(NANR_EXAMPLE))
+      self.assertEqual(NCER.load_from(tdir + "/out/multi_oam.NCER"), NCER.load_from(MULTI_OAM_NCER))
+
+  def test_manifest_creates_job_output_dirs(self):
+    with tempfile.TemporaryDirectory() as tdir:
+      jobs = [
+        {"op": "nanr-to-json", "input": NANR_EXAMPLE, "output_dir": tdir + "/anims/new"},
+        {"op": "ncer-to-json", "input": MULTI_OAM_NCER, "output": tdir + "/cells/multi_oam.json"},
+      ]
+      with open(tdir + "/jobs.json", "w") as f:
+        json.dump(jobs, f)
+      with redirect_stdout(io.StringIO()):
+        self.assertEqual(main(["--manifest", tdir + "/jobs.json", "-j", "1"]), 0)
+      self.assertTrue(os.path.exists(tdir + "/anims/new/big_anim.json"))
+      self.assertTrue(os.path.exists(tdir + "/cells/multi_oam.json"))
+
+  def test_cache(self):
+    with tempfile.TemporaryDirectory() as tdir:
+      job = {"op": "nanr-to-json", "input": NANR_EXAMPLE, "output": tdir + "/anim.json"}
+      cache = ConversionCache(tdir + "/cache")
+      self.assertEqual(run_job(job, cache)[1:], (None, False))
+      with open(tdir + "/anim.json", "rb") as f:
+        expected = f.read()
+      os.remove(tdir + "/anim.json")
+      self.assertEqual(run_job(job, cache)[1:], (None, True))
+      with open(tdir + "/anim.json", "rb") as f:
+        self.assertEqual(f.read(), expected)
+      self.assertEqual(run_job({**job, "mode": "RGB"}, cache)[1:], (None, False))
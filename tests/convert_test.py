@@ -1,3 +1,4 @@
+import random
 import tempfile
 import unittest
 
@@ -5,14 +6,18 @@ from PIL import Image
 
 import nitrogfx.convert as conv
 from nitrogfx.nanr import NANR, SeqMode, SeqType
-from nitrogfx.ncer import NCER
-from nitrogfx.ncgr import NCGR
+from nitrogfx.ncer import NCER, OAM, Cell
+from nitrogfx.ncgr import NCGR, Tile, TileBuffer
 from nitrogfx.nclr import NCLR
-from nitrogfx.nscr import NSCR
+from nitrogfx.nscr import NSCR, MapEntry
+from nitrogfx.util import TileCanvas, TilesetBuilder, get_tile_data
 
 TEST_IMG_8BPP = "test_data/8bpp.png"
 MULTI_OAM_NCER = "test_data/multi_oam.NCER"
 NANR_EXAMPLE = "test_data/big_anim.NANR"
+EXAMPLE_NCGR = "test_data/edu011_LZ.bin/edu011.NCGR"
+EXAMPLE_NSCR = "test_data/edu011_LZ.bin/edu011.NSCR"
+EXAMPLE_NCLR = "test_data/edu011_LZ.bin/edu011.NCLR"
 
 
 class ConvertTest(unittest.TestCase):
@@ -46,6 +51,75 @@ class ConvertTest(unittest.TestCase):
     self.assertEqual(nscr1, nscr2)
     self.assertEqual(nclr1, nclr2)
 
+  def test_tilemap_without_flipping(self):
+    tile = Tile([1 + i % 7 for i in range(64)])
+    flipped = tile.flipped(True, False)
+    im = Image.new("P", (16, 8))
+    im.putpalette([i * 10 for i in range(24)])
+    im.putdata([(tile if x < 8 else flipped).get_pixel(x % 8, y) for y in range(8) for x in range(16)])
+
+    (ncgr, nscr, nclr) = conv.img_to_nscr(im)
+    self.assertEqual(len(ncgr.tiles), 2)
+    self.assertTrue(nscr.map[1].xflip)
+    (ncgr, nscr, nclr) = conv.img_to_nscr(im, use_flipping=False)
+    self.assertEqual(len(ncgr.tiles), 3)
+    self.assertEqual(ncgr.tiles[2], flipped)
+    self.assertFalse(nscr.map[1].xflip)
+
+  def test_shared_tileset(self):
+    im = Image.open(TEST_IMG_8BPP)
+    tileset = TilesetBuilder()
+    (ncgr1, nscr1, nclr1) = conv.img_to_nscr(im, tileset=tileset)
+    (ncgr2, nscr2, nclr2) = conv.img_to_nscr(im.transpose(Image.Transpose.FLIP_LEFT_RIGHT), tileset=tileset)
+    self.assertEqual(ncgr1, ncgr2)
+    self.assertEqual(ncgr1, conv.img_to_nscr(im)[0])
+    self.assertEqual(nscr1, conv.img_to_nscr(im)[1])
+    with tempfile.TemporaryDirectory() as tdir:
+      tileset.save_as(tdir + "/tileset.bin")
+      tileset = TilesetBuilder.load_from(tdir + "/tileset.bin")
+    self.assertEqual(conv.img_to_nscr(im, tileset=tileset)[1], nscr1)
+
+  def noise_image(self, rng: random.Random, size: int) -> Image.Image:
+    "Indexed image whose tiles are all different and never blank"
+    im = Image.new("P", (size, size))
+    im.putpalette([i for i in range(256) for _ in range(3)])
+    im.frombytes(bytes(rng.randrange(1, 256) for _ in range(size * size)))
+    return im
+
+  def test_shared_tileset_limit(self):
+    rng = random.Random(0)
+    tileset = TilesetBuilder()
+    images = [self.noise_image(rng, 128) for _ in range(4)]  # 256 tiles each, the 4th doesn't fit
+    results = [conv.img_to_nscr(im, tileset=tileset) for im in images[:3]]
+    with self.assertRaises(ValueError):
+      conv.img_to_nscr(images[3], tileset=tileset)
+    self.assertEqual(len(tileset.get_tiles()), 1 + 3 * 256)
+    ncgr = tileset.as_ncgr(8)
+    for im, (_, nscr, nclr) in zip(images, results):
+      self.assertEqual(conv.nscr_to_img(ncgr, nscr, nclr).tobytes(), im.tobytes())
+
+  def test_shared_tileset_prunes_unused_tiles(self):
+    rng = random.Random(1)
+    a, b = self.noise_image(rng, 64), self.noise_image(rng, 64)
+    tileset = TilesetBuilder()
+    conv.img_to_nscr(a, tileset=tileset)
+    conv.img_to_nscr(b, tileset=tileset)
+    self.assertEqual(len(tileset.get_tiles()), 129)
+
+    a.paste(self.noise_image(rng, 8), (0, 0))  # edit one tile of a
+    tileset = TilesetBuilder.unpack(tileset.pack())
+    conv.img_to_nscr(a, tileset=tileset)
+    conv.img_to_nscr(b, tileset=tileset)
+    self.assertEqual(len(tileset.get_tiles()), 130)
+    self.assertEqual(len(TilesetBuilder.unpack(tileset.pack(prune=False)).get_tiles()), 130)
+
+    tileset = TilesetBuilder.unpack(tileset.pack())
+    self.assertEqual(len(tileset.get_tiles()), 129)
+    for im in (a, b):
+      (ncgr, nscr, nclr) = conv.img_to_nscr(im, tileset=tileset)
+      self.assertEqual(conv.nscr_to_img(ncgr, nscr, nclr).tobytes(), im.tobytes())
+    self.assertEqual(len(tileset.get_tiles()), 129)
+
   def test_convert_multi_oam_to_json(self):
     ncer = NCER.load_from(MULTI_OAM_NCER)
     with tempfile.TemporaryDirectory() as tdir:
@@ -73,3 +147,140 @@ class ConvertTest(unittest.TestCase):
       conv.nclr_to_jasc(nclr, tdir + "pal")
       nclr2 = conv.jasc_to_nclr(tdir + "pal")
     self.assertEqual(nclr, nclr2)
+
+  def test_image_tiles_match_pixel_reads(self):
+    im = Image.open(TEST_IMG_8BPP)
+    ncgr = conv.img_to_ncgr(im)
+    pixels = im.load()
+    for i in (0, 5, len(ncgr.tiles) - 1):
+      x, y = i % ncgr.width * 8, i // ncgr.width * 8
+      self.assertEqual(ncgr.tiles[i], get_tile_data(pixels, x, y))
+    with self.assertRaises(ValueError):
+      conv.img_to_ncgr(im.crop((0, 0, 12, 8)))
+
+  def test_img_to_ncgr_tile_storage(self):
+    im = Image.open(TEST_IMG_8BPP)
+    ncgr = conv.img_to_ncgr(im)
+    self.assertIsInstance(ncgr.tiles, list)
+    tiles = ncgr.tiles + [ncgr.tiles[0]]
+    del ncgr.tiles[0]
+    self.assertEqual(tiles[1:-1], ncgr.tiles)
+    contiguous = conv.img_to_ncgr(im, contiguous=True)
+    self.assertIsInstance(contiguous.tiles, TileBuffer)
+    self.assertEqual(contiguous.tiles, tiles[:-1])
+
+  def test_tilemap_renderer_matches_per_tile_drawing(self):
+    ncgr = NCGR.load_from(EXAMPLE_NCGR)
+    nscr = NSCR.load_from(EXAMPLE_NSCR)
+    expected = TileCanvas(nscr.width, nscr.height)
+    for y in range(nscr.height // 8):
+      for x in range(nscr.width // 8):
+        expected.draw_tile(ncgr, nscr.get_entry(x, y), x * 8, y * 8)
+    for tiles in (ncgr, NCGR.load_from(EXAMPLE_NCGR, contiguous=True)):
+      canvas = TileCanvas(nscr.width, nscr.height)
+      canvas.draw_tilemap(tiles, nscr)
+      self.assertEqual(canvas.data, expected.data)
+    ncgr.tiles = ncgr.tiles[:10]
+    nscr.get_entry(0, 0).tile = 10
+    with self.assertRaises(IndexError):
+      TileCanvas(nscr.width, nscr.height).draw_tilemap(ncgr, nscr)
+
+  def test_rgb_render_uses_palette_banks(self):
+    ncgr = NCGR(4)
+    ncgr.tiles.append(Tile([i & 0xF for i in range(64)]))
+    nscr = NSCR(16, 8, 0)
+    nscr.set_entry(0, 0, MapEntry(0, 0))
+    nscr.set_entry(1, 0, MapEntry(0, 1, True))
+    nclr = NCLR(False)
+    nclr.colors = [(8 * i, 0, 0) for i in range(16)] + [(0, 8 * i, 0) for i in range(16)]
+    img = conv.nscr_to_img(ncgr, nscr, nclr, "RGBA")
+    self.assertEqual(img.mode, "RGBA")
+    self.assertEqual(img.getpixel((0, 0)), (0, 0, 0, 0))
+    self.assertEqual(img.getpixel((3, 0)), (24, 0, 0, 255))
+    self.assertEqual(img.getpixel((8 + 7 - 3, 0)), (0, 24, 0, 255))
+    self.assertEqual(conv.nscr_to_img(ncgr, nscr, nclr, "RGB").getpixel((0, 0)), (0, 0, 0))
+
+  def test_rgb_render_of_8bpp_matches_indexed(self):
+    ncgr = NCGR.load_from(EXAMPLE_NCGR)
+    nscr = NSCR.load_from(EXAMPLE_NSCR)
+    nclr = NCLR.load_from(EXAMPLE_NCLR)
+    expected = conv.nscr_to_img(ncgr, nscr, nclr).convert("RGB")
+    self.assertEqual(conv.nscr_to_img(ncgr, nscr, nclr, "RGB").tobytes(), expected.tobytes())
+
+
+def sprite_tile(k: int) -> Tile:
+  "Tile whose pixels identify the tile and their position, with a transparent top left pixel"
+  return Tile([0 if i == 0 else (k + i % 8) % 15 + 1 for i in range(64)])
+
+
+def make_oam(x: int, y: int, dims: tuple[int, int], char: int, pal: int = 0, prio: int = 0) -> OAM:
+  oam = OAM()
+  oam.x, oam.y = x & 0x1FF, y & 0xFF
+  oam.set_size(dims)
+  oam.char, oam.pal, oam.prio, oam.colors = char, pal, prio, 16
+  return oam
+
+
+class SpriteRenderTest(unittest.TestCase):
+  def setUp(self):
+    self.ncgr = NCGR(4)
+    self.ncgr.tiles = [sprite_tile(k) for k in range(256)]
+    self.nclr = NCLR()
+    self.nclr.colors = [(i, 255 - i, i // 2) for i in range(256)]
+
+  def color(self, tile: int, x: int, y: int = 0, pal: int = 0) -> tuple[int, int, int, int]:
+    i = pal * 16 + sprite_tile(tile).get_pixel(x, y)
+    return (*self.nclr.colors[i], 255)
+
+  def test_cell_position_and_palette(self):
+    cell = Cell()
+    cell.oam = [make_oam(-8, -4, (16, 8), 2, pal=1)]
+    img = conv.cell_to_img(cell, self.ncgr, self.nclr)
+    self.assertEqual(img.size, (16, 8))
+    self.assertEqual(img.getpixel((0, 0)), (0, 0, 0, 0))
+    self.assertEqual(img.getpixel((1, 0)), self.color(2, 1, pal=1))
+    self.assertEqual(img.getpixel((9, 3)), self.color(3, 1, 3, pal=1))
+
+  def test_flipping(self):
+    cell = Cell()
+    cell.oam = [make_oam(0, 0, (16, 8), 2)]
+    cell.oam[0].rotsca = 0x18  # hflip and vflip
+    img = conv.cell_to_img(cell, self.ncgr, self.nclr)
+    self.assertEqual(img.getpixel((15, 7)), (0, 0, 0, 0))
+    self.assertEqual(img.getpixel((14, 7)), self.color(2, 1))
+    self.assertEqual(img.getpixel((6, 7)), self.color(3, 1))
+
+  def test_priority(self):
+    cell = Cell()
+    cell.oam = [make_oam(0, 0, (8, 8), 1, prio=1), make_oam(4, 0, (8, 8), 5, prio=0), make_oam(4, 0, (8, 8), 9)]
+    img = conv.cell_to_img(cell, self.ncgr, self.nclr)
+    self.assertEqual(img.size, (12, 8))
+    self.assertEqual(img.getpixel((3, 1)), self.color(1, 3, 1))
+    self.assertEqual(img.getpixel((5, 1)), self.color(5, 1, 1))
+
+  def test_mapping_types(self):
+    cell = Cell()
+    cell.oam = [make_oam(0, 0, (16, 16), 3)]
+    for mapping_type, tiles in ((0, (3, 4, 5, 6)), (1, (6, 7, 8, 9)), (3, (24, 25, 26, 27)), (4, (3, 4, 35, 36))):
+      img = conv.cell_to_img(cell, self.ncgr, self.nclr, mapping_type)
+      for i, tile in enumerate(tiles):
+        self.assertEqual(img.getpixel((i % 2 * 8 + 1, i // 2 * 8)), self.color(tile, 1))
+
+  def test_sprite_sheet(self):
+    ncer = NCER()
+    ncer.cells = [Cell(), Cell(), Cell()]
+    ncer.cells[0].oam = [make_oam(-8, -8, (8, 8), 1)]
+    ncer.cells[1].oam = [make_oam(0, 0, (8, 8), 2)]
+    ncer.cells[2].oam = [make_oam(0, -8, (8, 8), 3, pal=2)]
+    sheet = conv.ncer_to_img(ncer, self.ncgr, self.nclr, columns=2)
+    self.assertEqual(sheet.size, (32, 32))  # 16x16 frames sharing the origin at (8, 8)
+    self.assertEqual(sheet.getpixel((1, 0)), self.color(1, 1))
+    self.assertEqual(sheet.getpixel((25, 8)), self.color(2, 1))
+    self.assertEqual(sheet.getpixel((9, 16)), self.color(3, 1, pal=2))
+    self.assertEqual(sheet.getpixel((1, 16)), (0, 0, 0, 0))
+
+  def test_char_out_of_range(self):
+    cell = Cell()
+    cell.oam = [make_oam(0, 0, (8, 8), 0x3FF)]
+    with self.assertRaises(IndexError):
+      conv.cell_to_img(cell, self.ncgr, self.nclr)
@@ -1,7 +1,7 @@
 import tempfile
 import unittest
 
-from nitrogfx.nanr import NANR, Frame0, SeqMode, SeqType
+from nitrogfx.nanr import NANR, Frame0, Frame2, SeqMode, SeqType, Sequence
 
 EXAMPLE_NANR = "test_data/nanr.NANR"
 EXAMPLE_NANR2 = "test_data/big_anim.NANR"
@@ -73,3 +73,52 @@ class NANRTest(unittest.TestCase):
 
   def test_pack_example2_matches_original(self):
     self.__test_packed_matches_original(EXAMPLE_NANR2)
+
+  def test_mmap_load_matches_read(self):
+    for path in (EXAMPLE_NANR, EXAMPLE_NANR2):
+      self.assertEqual(NANR.load_from(path, mmap=True), NANR.load_from(path))
+
+  def test_pack_dedupes_frames(self):
+    nanr = NANR()
+    for frame_type in (0, 2):
+      seq = Sequence()
+      seq.frame_type = frame_type
+      for i in range(1000):
+        frame = seq.add_frame()
+        frame.index = i % 50
+        frame.duration = i % 7
+      nanr.anims = [seq]
+      data = nanr.pack()
+      self.assertLessEqual(len(data), 0x48 + 8 * 1000 + 8 * 50 + 12)
+      self.assertEqual(NANR.unpack(data), nanr)
+
+  def test_pack_unpack_mixed_sequences(self):
+    nanr = NANR()
+    for frame_type, frame_cnt in ((1, 3), (0, 7), (2, 1), (1, 12)):
+      seq = Sequence()
+      seq.frame_type = frame_type
+      for i in range(frame_cnt):
+        frame = seq.add_frame()
+        frame.index = i
+        frame.duration = frame_cnt
+        if frame_type == 1:
+          frame.rotZ, frame.sx, frame.sy, frame.px, frame.py = i * 0x100, 0x1000 + i, 0x2000, 3, 4
+        elif frame_type == 2:
+          frame.px, frame.py = 5, 6
+      nanr.anims.append(seq)
+    data = nanr.pack()
+    nanr2 = NANR.unpack(data)
+    self.assertEqual(nanr2.pack(), data)
+    for seq, seq2 in zip(nanr.anims, nanr2.anims):
+      if seq.frame_type != 0:
+        self.assertEqual(seq, seq2)
+      # Frame0 records may share data with other frames, so only their index and duration are kept
+      self.assertEqual([(f.index, f.duration) for f in seq.frames], [(f.index, f.duration) for f in seq2.frames])
+
+  def test_frames_compare_field_wise(self):
+    self.assertFalse(hasattr(Frame0(), "__dict__"))
+    self.assertEqual(Frame0(), Frame0())
+    self.assertNotEqual(Frame0(), Frame2())
+    seq = Sequence()
+    seq.add_frame().index = 4
+    self.assertNotEqual(seq, Sequence())
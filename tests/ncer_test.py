@@ -81,3 +81,32 @@ class NCERTest(unittest.TestCase):
     self.assertEqual(oam.get_size(), (64, 32))
     with self.assertRaises(Exception):
       oam.set_size((33, 1))
+
+  def test_mmap_load_matches_read(self):
+    for path in (PACKED_JSON, MULTI_OAM_NCER):
+      self.assertEqual(ncer.NCER.load_from(path, mmap=True), ncer.NCER.load_from(path))
+
+  def test_oam_attrs_roundtrip(self):
+    for a0, a1, a2 in ((0xFFFF, 0xFFFF, 0xFFFF), (0x12AB, 0x8D34, 0x5C07), (0xDFFF, 0, 0x3FF)):
+      oam = ncer.OAM.from_attrs(a0, a1, a2)
+      self.assertEqual(oam.to_attrs(), (a0, a1, a2))
+      self.assertEqual(ncer.OAM.unpack(oam.pack()), oam)
+
+  def test_pack_many_cells(self):
+    x = ncer.NCER.load_from(MULTI_OAM_NCER)
+    x.cells = x.cells * 2000
+    x.labels = [f"cell{i}" for i in range(len(x.cells))]
+    y = ncer.NCER.unpack(x.pack())
+    self.assertEqual(len(y.cells), len(x.cells))
+    self.assertEqual(y.cells, x.cells)
+    self.assertEqual(y.labels, x.labels)
+
+  def test_oam_and_cell_are_compact(self):
+    a, b = ncer.OAM(), ncer.OAM()
+    self.assertFalse(hasattr(a, "__dict__"))
+    self.assertEqual(a, b)
+    b.pal = 3
+    self.assertNotEqual(a, b)
+    self.assertNotEqual(ncer.Cell(), a)
+    with self.assertRaises(AttributeError):
+      a.colour = 16
@@ -1,6 +1,7 @@
 import unittest
 
-from nitrogfx.ncgr import NCGR, Tile
+import nitrogfx.c_ext.tile as c_ext
+from nitrogfx.ncgr import NCGR, Tile, TileBuffer
 
 EXAMPLE_NCGR = "test_data/edu011_LZ.bin/edu011.NCGR"
 EXAMPLE_NCBR = "test_data/npc.NCBR"
@@ -62,3 +63,126 @@ class TestNcgr(unittest.TestCase):
     self.assertEqual(xflip.get_pixel(0, 0), test_tile.get_pixel(7, 0))
     self.assertEqual(yflip.get_pixel(0, 0), test_tile.get_pixel(0, 7))
     self.assertEqual(xyflip.get_pixel(0, 0), test_tile.get_pixel(7, 7))
+
+  def test_bulk_unpack_matches_per_tile_conversion(self):
+    data = bytes((i * 7) & 0xFF for i in range(0x20 * 3))
+    tiles = c_ext.unpack_tiles(data, 4, 3)
+    self.assertEqual(tiles, [c_ext._4bpp_to_8bpp(data[i * 0x20 : i * 0x20 + 0x20]) for i in range(3)])
+    with self.assertRaises(ValueError):
+      c_ext.unpack_tiles(data, 8, 3)
+
+  def test_contiguous_unpack_matches_list_storage(self):
+    for path in (EXAMPLE_NCGR, EXAMPLE_NCBR):
+      with open(path, "rb") as f:
+        x = f.read()
+      listed = NCGR.unpack(x)
+      contiguous = NCGR.unpack(x, contiguous=True)
+      self.assertIsInstance(contiguous.tiles, TileBuffer)
+      self.assertEqual(listed, contiguous)
+      self.assertEqual(x, contiguous.pack())
+
+  def test_tile_buffer_views_write_through(self):
+    x = NCGR(4, contiguous=True)
+    x.tiles.append(Tile([i & 0xF for i in range(64)]))
+    x.tiles.append(Tile([0] * 64))
+    x.tiles[1] = x.tiles[0].flipped(True, False)
+    self.assertEqual(len(x.tiles), 2)
+    self.assertEqual(x.tiles[1].get_pixel(0, 0), x.tiles[0].get_pixel(7, 0))
+    x.tiles[0].pixels = bytes(64)
+    self.assertEqual(x.tiles.data[:64], bytes(64))
+    self.assertEqual(NCGR.unpack(x.pack()), x)
+
+  def test_tile_buffer_behaves_like_list(self):
+    tiles = [Tile([(i * t) & 0xF for i in range(64)]) for t in range(8)]
+    for bpp in (4, 8):
+      listed = list(tiles)
+      buffer = TileBuffer.from_tiles(tiles, bpp)
+      for ops in (
+        lambda x: x.__delitem__(0),
+        lambda x: x.__delitem__(slice(1, 5, 2)),
+        lambda x: x.insert(1, tiles[7]),
+        lambda x: x.insert(-100, tiles[6]),
+        lambda x: x.__setitem__(slice(0, 2), [tiles[5]]),
+        lambda x: x.__setitem__(slice(None, None, 2), tiles[: len(x[::2])]),
+        lambda x: x.reverse(),
+        lambda x: x.remove(tiles[7]),
+        lambda x: x.__iadd__([tiles[3]]),
+      ):
+        ops(listed)
+        ops(buffer)
+        self.assertEqual(buffer, listed)
+      self.assertEqual(buffer.pop(), listed.pop())
+      self.assertEqual(buffer.pop(0), listed.pop(0))
+      self.assertEqual(buffer + [tiles[2]], listed + [tiles[2]])
+      self.assertEqual(buffer, listed)
+      buffer.clear()
+      self.assertEqual(len(buffer), 0)
+
+  def test_truncated_tile_data_raises(self):
+    for path in (EXAMPLE_NCGR, EXAMPLE_NCBR):
+      with open(path, "rb") as f:
+        x = f.read()[:0x40]
+      for options in ({}, {"contiguous": True}, {"packed": True}):
+        with self.assertRaisesRegex(ValueError, "too short"):
+          NCGR.unpack(x, **options)
+
+  def test_packed_4bpp_round_trip(self):
+    x = NCGR()
+    x.tiles.append(Tile([i & 0xF for i in range(64)]))
+    x.tiles.append(Tile([(i * 3) & 0xF for i in range(64)]))
+    data = x.pack()
+    y = NCGR.unpack(data, packed=True)
+    self.assertEqual(y.tiles.bpp, 4)
+    self.assertEqual(len(y.tiles.data), 0x40)
+    self.assertEqual(data, y.pack())
+    self.assertEqual(x, y)
+    self.assertEqual(y.tiles[1].get_pixel(3, 2), x.tiles[1].get_pixel(3, 2))
+    self.assertEqual(y.tiles[0].flipped(True, True), x.tiles[0].flipped(True, True))
+
+  def test_packed_ncbr_repack_matches_original(self):
+    with open(EXAMPLE_NCBR, "rb") as f:
+      x = f.read()
+    self.assertEqual(x, NCGR.unpack(x, packed=True).pack())
+
+  def test_pack_tiles_converts_between_depths(self):
+    tile = bytes(i & 0xF for i in range(64))
+    packed = c_ext._8bpp_to_4bpp(tile)
+    self.assertEqual(c_ext.pack_tiles(b"H", [tile], 4, b"T"), b"H" + packed + b"T")
+    self.assertEqual(c_ext.pack_tiles(b"H", packed, 8, b"T", 4), b"H" + tile + b"T")
+    self.assertEqual(c_ext.pack_tiles(b"", bytearray(tile), 4, b""), packed)
+
+  def test_pack_tiles_accepts_bytes_like_pixels(self):
+    pixels = bytes(i & 0xF for i in range(64))
+    x = NCGR(4)
+    x.tiles = [Tile(pixels), Tile(bytearray(pixels)), Tile(memoryview(pixels))]
+    x.set_width(3)
+    self.assertEqual(NCGR.unpack(x.pack()).tiles, [Tile(pixels)] * 3)
+    x.ncbr = True
+    self.assertEqual(NCGR.unpack(x.pack()).tiles, [Tile(pixels)] * 3)
+    with self.assertRaisesRegex(TypeError, "not int"):
+      c_ext.pack_tiles(b"", [5], 4, b"")
+    with self.assertRaisesRegex(ValueError, "64 bytes"):
+      c_ext.pack_tiles(b"", [bytes(63)], 4, b"")
+
+  def test_ncbr_kernels_match_per_tile_reads(self):
+    with open(EXAMPLE_NCBR, "rb") as f:
+      data = f.read()[0x30:]
+    tiles = c_ext.unpack_ncbr(data, 4, 32, 4)
+    self.assertEqual(tiles, b"".join(c_ext.read_ncbr_tile(data, i, 4, 32) for i in range(128)))
+    self.assertEqual(c_ext.pack_ncbr(tiles, 4, 32, 4), data[: 32 * 4 * 0x20])
+    with self.assertRaises(ValueError):
+      c_ext.unpack_ncbr(data, 8, 32, 4)
+
+  def test_pack_ncbr8bpp(self):
+    x = NCGR(8)
+    x.ncbr = True
+    x.tiles = [Tile([(i + t) & 0xFF for i in range(64)]) for t in range(6)]
+    x.set_width(3)
+    d = x.pack()
+    self.assertEqual(NCGR.unpack(d), x)
+    self.assertEqual(NCGR.unpack(d, packed=True).pack(), d)
+
+  def test_mmap_load_matches_read(self):
+    for path in (EXAMPLE_NCGR, EXAMPLE_NCBR):
+      self.assertEqual(NCGR.load_from(path, mmap=True), NCGR.load_from(path))
+      self.assertEqual(NCGR.load_from(path, packed=True, mmap=True), NCGR.load_from(path))
@@ -26,3 +26,6 @@ class TestNclr(unittest.TestCase):
     with open(EXAMPLE_NCLR, "rb") as f:
       x = f.read()
     self.assertEqual(x, NCLR.unpack(x).pack())
+
+  def test_mmap_load_matches_read(self):
+    self.assertEqual(NCLR.load_from(EXAMPLE_NCLR, mmap=True), NCLR.load_from(EXAMPLE_NCLR))
@@ -45,3 +45,42 @@ class TestNscr(unittest.TestCase):
       self.assertTrue(entry.yflip == 0 or entry.yflip == 1)
       self.assertTrue(entry.tile >= 0 and entry.tile < 1024)
       self.assertTrue(entry.pal >= 0 and entry.pal < 16)
+
+  def test_mmap_load_matches_read(self):
+    self.assertEqual(NSCR.load_from(EXAMPLE_NSCR, mmap=True), NSCR.load_from(EXAMPLE_NSCR))
+
+  def test_entry_views_edit_map_in_place(self):
+    x = NSCR(64, 64)
+    entry = x.get_entry(1, 2)
+    entry.tile = 0x3FF
+    entry.pal = 5
+    entry.yflip = True
+    self.assertEqual(x.get_entry(1, 2), MapEntry(0x3FF, 5, False, True))
+    self.assertEqual(x.entries[2 * 8 + 1], 0x3FF | (1 << 11) | (5 << 12))
+    x.map = [MapEntry(i, i & 0xF, bool(i & 1)) for i in range(64)]
+    self.assertEqual(x.map[63], MapEntry(63, 15, True))
+    self.assertEqual(NSCR.unpack(x.pack()), x)
+
+  def test_map_behaves_like_list(self):
+    x = NSCR(64, 64)
+    x.map = [MapEntry(i, i & 0xF, bool(i & 1)) for i in range(64)]
+    listed = [MapEntry(i, i & 0xF, bool(i & 1)) for i in range(64)]
+    for op in (
+      lambda m: m.append(MapEntry(5, 1)),
+      lambda m: m.__delitem__(0),
+      lambda m: m.__delitem__(slice(1, 10, 3)),
+      lambda m: m.insert(2, MapEntry(7, 2, True, True)),
+      lambda m: m.__setitem__(slice(0, 3), [MapEntry(1)]),
+      lambda m: m.__setitem__(slice(None, None, 2), [MapEntry(i) for i in range(len(m[::2]))]),
+      lambda m: m.extend([MapEntry(9), MapEntry(10)]),
+      lambda m: m.reverse(),
+      lambda m: m.remove(MapEntry(9)),
+    ):
+      op(listed)
+      op(x.map)
+      self.assertEqual(x.map, listed)
+    self.assertEqual(x.map.pop(), listed.pop())
+    self.assertEqual(x.map + [MapEntry(3)], listed + [MapEntry(3)])
+    x.map += [MapEntry(4)]
+    self.assertEqual(x.map, listed + [MapEntry(4)])
+    self.assertEqual(len(x.entries), len(listed) + 1)
@@ -0,0 +1,55 @@
+import unittest
+
+from nitrogfx.nanr import NANR
+from nitrogfx.ncer import NCER
+from nitrogfx.ncgr import NCGR
+from nitrogfx.nclr import NCLR
+from nitrogfx.nscr import NSCR
+from nitrogfx.probe import probe
+
+EXAMPLE_NCGR = "test_data/edu011_LZ.bin/edu011.NCGR"
+EXAMPLE_NSCR = "test_data/edu011_LZ.bin/edu011.NSCR"
+EXAMPLE_NCLR = "test_data/edu011_LZ.bin/edu011.NCLR"
+EXAMPLE_NCBR = "test_data/npc.NCBR"
+EXAMPLE_NCER = "test_data/multi_oam.NCER"
+EXAMPLE_NANR = "test_data/big_anim.NANR"
+
+
+class ProbeTest(unittest.TestCase):
+  def test_ncgr(self):
+    for path in (EXAMPLE_NCGR, EXAMPLE_NCBR):
+      ncgr = NCGR.load_from(path)
+      info = probe(path)
+      self.assertEqual(info.format, "NCGR")
+      self.assertEqual((info.bpp, info.count, info.ncbr), (ncgr.bpp, len(ncgr.tiles), ncgr.ncbr))
+      if info.width is not None:
+        self.assertEqual((info.width, info.height), (ncgr.width * 8, ncgr.height * 8))
+
+  def test_nscr(self):
+    nscr = NSCR.load_from(EXAMPLE_NSCR)
+    info = probe(EXAMPLE_NSCR)
+    self.assertEqual(info.format, "NSCR")
+    self.assertEqual((info.width, info.height, info.count), (nscr.width, nscr.height, len(nscr.entries)))
+    self.assertEqual(info.bpp, 8 if nscr.is8bpp else 4)
+
+  def test_nclr(self):
+    nclr = NCLR.load_from(EXAMPLE_NCLR)
+    info = probe(EXAMPLE_NCLR)
+    self.assertEqual(info.format, "NCLR")
+    self.assertEqual((info.count, info.bpp), (len(nclr.colors), 8 if nclr.is8bpp else 4))
+
+  def test_ncer_and_nanr(self):
+    ncer = NCER.load_from(EXAMPLE_NCER)
+    info = probe(EXAMPLE_NCER)
+    self.assertEqual((info.format, info.section_magic), ("NCER", b"KBEC"))
+    self.assertEqual((info.count, info.extended), (len(ncer.cells), ncer.extended))
+    self.assertEqual(info.mapping_type, ncer.mapping_type)
+    nanr = NANR.load_from(EXAMPLE_NANR)
+    with open(EXAMPLE_NANR, "rb") as f:
+      info = probe(f.read())
+    self.assertEqual((info.format, info.count, info.frames), ("NANR", len(nanr.anims), nanr.total_frames()))
+    self.assertEqual(info.section_count, 3)
+
+  def test_not_nitro(self):
+    with self.assertRaises(ValueError):
+      probe(b"\x89PNG\r\n\x1a\n" + bytes(40))
@@ -0,0 +1,56 @@
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import nitrogfx.c_ext.tile as c_ext
+
+try:
+  import resource
+except ImportError:  # not available on Windows
+  resource = None
+
+CALLS = 1_000_000
+
+
+def max_rss_kb() -> int:
+  rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  return rss // 1024 if sys.platform == "darwin" else rss
+
+
+class TestTileKernels(unittest.TestCase):
+  @unittest.skipIf(resource is None, "needs the resource module")
+  def test_kernels_do_not_leak(self):
+    tile = bytes(i & 0xF for i in range(64))
+    packed = c_ext._8bpp_to_4bpp(tile)
+    tiles = [tile] * 4
+    kernels = [
+      lambda: c_ext._4bpp_to_8bpp(packed),
+      lambda: c_ext._8bpp_to_4bpp(tile),
+      lambda: c_ext.flip_tile_data(tile, True, True),
+      lambda: c_ext.read_ncbr_tile(packed, 0, 4, 1),
+      lambda: c_ext.pack_ncbr_tiles(tiles, 2, 2),
+    ]
+    for kernel in kernels:
+      for _ in range(1000):  # warm up allocator pools
+        kernel()
+    before = max_rss_kb()
+    for kernel in kernels:
+      for _ in range(CALLS // len(kernels)):
+        kernel()
+    # leaking every result buffer would grow RSS by at least 64 bytes per call
+    self.assertLess(max_rss_kb() - before, CALLS * 64 // 1024 // 4)
+
+  def test_kernels_are_thread_safe_on_shared_buffers(self):
+    data = bytearray(i & 0xFF for i in range(0x20 * 2048))
+    expected = c_ext._4bpp_to_8bpp(bytes(data))
+    expected_ncbr = c_ext.pack_ncbr(expected, 4, 64, 32)
+
+    def convert(_):
+      tiles = c_ext._4bpp_to_8bpp(data)
+      return tiles, c_ext.pack_ncbr(tiles, 4, 64, 32), c_ext.unpack_ncbr(memoryview(expected_ncbr), 4, 64, 32)
+
+    with ThreadPoolExecutor(4) as pool:
+      for tiles, ncbr, unpacked in pool.map(convert, range(16)):
+        self.assertEqual(tiles, expected)
+        self.assertEqual(ncbr, expected_ncbr)
+        self.assertEqual(unpacked, expected)
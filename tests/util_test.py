@@ -1,3 +1,4 @@
+import struct
 import unittest
 
 import nitrogfx.util as util
@@ -31,3 +32,72 @@ class TestUtil(unittest.TestCase):
     self.assertEqual(len(tiles), 2)
     self.assertEqual(tiles[0], t1)
     self.assertEqual(tiles[1], t2)
+
+  def test_bulk_color_conv_matches_single(self):
+    colors = [(8 * (i & 0x1F), 8 * ((i >> 5) & 0x1F), 8 * (i >> 10)) for i in range(0, 0x8000, 7)]
+    packed = util.pack_colors(colors)
+    self.assertEqual(packed, b"".join(struct.pack("<H", util.color_to_rgb555(c)) for c in colors))
+    self.assertEqual(util.unpack_colors(packed), colors)
+    self.assertEqual(util.unpack_colors(b"\xff\xff"), [util.rgb555_to_color(0xFFFF)])
+
+  def test_tilesetbuilder_flipping(self):
+    builder = util.TilesetBuilder()
+    t1 = Tile([(i * 37) & 0xFF for i in range(64)])
+    builder.add(t1.flipped(True, False))
+    for hflip in (False, True):
+      for vflip in (False, True):
+        tile = t1.flipped(hflip, vflip)
+        entry = builder.get_map_entry(tile)
+        self.assertEqual(entry.tile, 0)
+        self.assertEqual(builder.get_tiles()[0].flipped(entry.xflip, entry.yflip), tile)
+
+  def test_tilehash_has_no_collisions(self):
+    # tiles that are not flipped copies of each other must never be merged
+    tiles = [Tile(bytes([i]) + bytes(63)) for i in range(256)] + [Tile(bytes(63) + bytes([i])) for i in range(1, 256)]
+    builder = util.TilesetBuilder()
+    for tile in tiles:
+      builder.add(tile)
+    self.assertEqual(len(builder.get_tiles()), 256)
+    self.assertEqual(util.TileHash(tiles[3]), util.TileHash(tiles[258]))
+    self.assertNotEqual(util.TileHash(tiles[3]), util.TileHash(tiles[4]))
+    self.assertEqual(util.TileHash(tiles[3]).get_flipping(tiles[258]), (True, True))
+
+  def test_tilesetbuilder_bulk_entries_match_single(self):
+    pool = [Tile([(i * t * 13) & 0xFF for i in range(64)]) for t in range(1, 6)]
+    tiles = [pool[(i * 7) % 5].flipped(i & 1, i & 2) for i in range(40)]
+    data = b"".join(tile.get_data() for tile in tiles)
+    for use_flipping in (True, False):
+      bulk, single = util.TilesetBuilder(use_flipping), util.TilesetBuilder(use_flipping)
+      single.add(pool[2])
+      bulk.add(pool[2])
+      entries = bulk.get_map_entries(data)
+      self.assertEqual(list(entries), [single.get_map_entry(tile).to_raw() for tile in tiles])
+      self.assertEqual(bulk.get_tiles(), single.get_tiles())
+
+  def test_tilesetbuilder_tile_limit(self):
+    tiles = [struct.pack("<H", i) + bytes(62) for i in range(util.TilesetBuilder.MAX_TILES + 8)]
+    for use_flipping in (True, False):
+      builder = util.TilesetBuilder(use_flipping)
+      builder.get_map_entries(b"".join(tiles[:1020]))
+      with self.assertRaises(ValueError):
+        builder.get_map_entries(b"".join(tiles[1016:1032]))
+      self.assertEqual(len(builder.get_tiles()), 1020)
+      self.assertEqual(list(builder.get_map_entries(b"".join(tiles[1016:1024]))), list(range(1016, 1024)))
+      with self.assertRaises(ValueError):
+        builder.add(Tile(tiles[1024]))
+      self.assertEqual(builder.get_map_entry(Tile(tiles[3])).tile, 3)
+
+  def test_tilesetbuilder_save_and_load(self):
+    t1 = Tile([i for i in range(64)])
+    t2 = Tile([2 * i for i in range(64)])
+    builder = util.TilesetBuilder()
+    builder.add(t1.flipped(True, False))
+    data = t2.get_data() + t1.get_data() + t2.flipped(False, True).get_data()
+    entries = builder.get_map_entries(data)
+    self.assertEqual([e & 0xFFF for e in entries], [1, 0x400, 0x801])
+
+    loaded = util.TilesetBuilder.unpack(builder.pack())
+    self.assertEqual(loaded.get_tiles(), builder.get_tiles())
+    self.assertEqual(loaded.get_map_entry(t1).to_raw(), builder.get_map_entry(t1).to_raw())
+    self.assertEqual(loaded.get_map_entries(data), entries)
+    self.assertEqual(len(loaded.get_tiles()), 2)